@@ -0,0 +1,172 @@
+import re
+import struct
+
+MAX_DIR_SIZE = 1024 * 1024  # bounds reads driven by corrupt directory records
+SERIAL_REGEXP = re.compile(rb"[A-Z]{4}[_-][0-9]{3}[.][0-9]{2}|LSP[0-9]{5}[.][0-9]{3}")
+DISC_ID_REGEXP = re.compile(r"[A-Z]{4}-?[0-9]{5}")  # PSP PARAM.SFO / UMD_DATA.BIN
+
+
+def normalize_serial(serial):
+    """SLUS_123.45 / ULUS10041 -> SLUS-12345 / ULUS-10041"""
+    serial = serial.replace("_", "").replace(".", "").replace("-", "")
+    return serial[:4] + "-" + serial[4:]
+
+
+class ISO9660:
+    """Minimal ISO9660 reader over a seekable file.
+
+    Supports 2048-byte sector images (PS2/PSP iso) and raw 2352-byte
+    sector images (PS1 bin, Mode 1 or Mode 2), reading only the sectors
+    needed to walk the directory tree.
+    """
+
+    LAYOUTS = [(2048, 0), (2352, 24), (2352, 16)]
+
+    def __init__(self, f):
+        self.f = f
+        self.sector_size = None
+        self.data_offset = None
+
+        for sector_size, data_offset in self.LAYOUTS:
+            self.f.seek(16 * sector_size + data_offset)
+            if self.f.read(6) == b"\x01CD001":
+                self.sector_size = sector_size
+                self.data_offset = data_offset
+                break
+        else:
+            raise ValueError("Not an ISO9660 image.")
+
+    def read_sectors(self, lba, size):
+        data = bytearray()
+        while len(data) < size:
+            self.f.seek(lba * self.sector_size + self.data_offset)
+            sector = self.f.read(2048)
+            if not sector:
+                break
+            data.extend(sector)
+            lba += 1
+        return bytes(data[:size])
+
+    @staticmethod
+    def parse_record(data, p):
+        lba, size = struct.unpack_from("<I4xI", data, p + 2)
+        is_dir = bool(data[p + 25] & 0x02)
+        name_len = data[p + 32]
+        name = data[p + 33 : p + 33 + name_len].decode("ascii", "replace")
+        return name.split(";")[0].upper(), lba, size, is_dir
+
+    def root(self):
+        pvd = self.read_sectors(16, 2048)
+        _, lba, size, _ = self.parse_record(pvd, 156)
+        return lba, size
+
+    def list_dir(self, lba, size):
+        data = self.read_sectors(lba, min(size, MAX_DIR_SIZE))
+        entries = {}
+        p = 0
+        while p < len(data):
+            record_len = data[p]
+            if record_len == 0:  # records never cross a sector boundary
+                p = (p // 2048 + 1) * 2048
+                continue
+            name, e_lba, e_size, is_dir = self.parse_record(data, p)
+            entries[name] = (e_lba, e_size, is_dir)
+            p += record_len
+        return entries
+
+    def find(self, path):
+        lba, size = self.root()
+        for part in path.upper().split("/"):
+            entry = self.list_dir(lba, size).get(part)
+            if entry is None:
+                return None
+            lba, size, _ = entry
+        return lba, size
+
+    def read_file(self, path, max_size=0x10000):
+        entry = self.find(path)
+        if entry is None:
+            return None
+        lba, size = entry
+        return self.read_sectors(lba, min(size, max_size))
+
+
+def parse_system_cnf(data):
+    boot = re.search(rb"BOOT2?\s*=\s*cdrom0?:\\*([^;\s]+)", data)
+    if boot:
+        return boot.group(1).split(b"\\")[-1].decode("ascii", "replace")
+    return None
+
+
+def parse_param_sfo(data, key="DISC_ID"):
+    if data[:4] != b"\x00PSF":
+        return None
+    key_table, data_table, count = struct.unpack_from("<III", data, 8)
+    for i in range(count):
+        key_offset, _, data_len, _, data_offset = struct.unpack_from("<HHIII", data, 20 + i * 16)
+        start = key_table + key_offset
+        name = data[start : data.index(b"\x00", start)].decode("ascii", "replace")
+        if name == key:
+            value = data[data_table + data_offset : data_table + data_offset + data_len]
+            return value.rstrip(b"\x00").decode("ascii", "replace")
+    return None
+
+
+def disc_serial(f):
+    """Read the serial from SYSTEM.CNF (PS1/PS2) or PARAM.SFO/UMD_DATA.BIN (PSP).
+
+    Returns None for images that are not ISO9660 or whose filesystem is
+    corrupt or truncated.
+    """
+    try:
+        return read_disc_serial(ISO9660(f))
+    except (IndexError, struct.error, ValueError, UnicodeDecodeError):
+        return None
+
+
+def read_disc_serial(iso):
+    cnf = iso.read_file("SYSTEM.CNF")
+    if cnf:
+        # boot files like PSX.EXE are no serial; leave those to the windowed scan
+        serial = parse_system_cnf(cnf)
+        if serial and SERIAL_REGEXP.fullmatch(serial.encode("ascii", "replace")):
+            return normalize_serial(serial)
+
+    sfo = iso.read_file("PSP_GAME/PARAM.SFO")
+    if sfo:
+        serial = parse_param_sfo(sfo)
+        if serial and DISC_ID_REGEXP.fullmatch(serial):
+            return normalize_serial(serial)
+
+    umd = iso.read_file("UMD_DATA.BIN", 0x100)
+    if umd:
+        serial = umd.split(b"|")[0].decode("ascii", "replace")
+        if DISC_ID_REGEXP.fullmatch(serial):
+            return normalize_serial(serial)
+    return None
+
+
+class WindowedSearch:
+    """Search a regexp across streamed chunks, bounded to the first ``limit`` bytes."""
+
+    def __init__(self, regexp=SERIAL_REGEXP, limit=64 * 1024 * 1024, overlap=32):
+        self.regexp = regexp
+        self.limit = limit
+        self.overlap = overlap
+        self.tail = b""
+        self.seen = 0
+        self.result = None
+
+    @property
+    def done(self):
+        return self.result is not None or self.seen >= self.limit
+
+    def feed(self, chunk):
+        chunk = chunk[: self.limit - self.seen]
+        self.seen += len(chunk)
+        window = self.tail + chunk
+        found = self.regexp.search(window)
+        if found:
+            self.result = normalize_serial(found.group(0).decode("utf-8"))
+        self.tail = window[-self.overlap :]
+        return self.done
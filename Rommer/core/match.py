@@ -0,0 +1,272 @@
+import re
+import time
+from collections import Counter, defaultdict
+
+from fuzzywuzzy import fuzz, utils
+
+
+def norm_hash(value):
+    if value is None:
+        return None
+    value = str(value).strip().upper()
+    return value or None
+
+
+def norm_size(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_name(name):
+    """Case-fold a name and strip region/revision tags like (USA) or [!]."""
+    name = re.sub(r"\([^)]*\)|\[[^\]]*\]", " ", name)
+    return " ".join(re.sub(r"[\W_]+", " ", name.casefold()).split())
+
+
+class FuzzyIndex:
+    """Token inverted index over meta names.
+
+    Each query is narrowed to a small candidate set sharing its rarest
+    tokens before ``fuzz.WRatio`` runs, and scoring stops at the first
+    candidate above the cutoff.
+    """
+
+    def __init__(self, names, cutoff=95, limit=50, max_postings=2000):
+        self.names = list(names)
+        self.cutoff = cutoff
+        self.limit = limit
+        self.max_postings = max_postings
+        self.tokens = defaultdict(list)
+
+        for i, name in enumerate(self.names):
+            for token in set(normalize_name(name).split()):
+                self.tokens[token].append(i)
+
+    def candidates(self, query):
+        postings = [self.tokens[t] for t in set(normalize_name(query).split()) if t in self.tokens]
+        postings.sort(key=len)
+        # common tokens like "the" only help when nothing rarer is shared
+        rare = [p for p in postings if len(p) <= self.max_postings]
+        postings = rare or postings[:1]
+
+        weights = Counter()
+        for posting in postings:
+            weight = 1 / len(posting)
+            for i in posting:
+                weights[i] += weight
+        return [self.names[i] for i, _ in weights.most_common(self.limit)]
+
+    def extract(self, query):
+        """Return (name, score) of a candidate above the cutoff, or (None, 0)."""
+        if not utils.full_process(query):
+            return None, 0
+        for name in self.candidates(query):
+            score = fuzz.WRatio(query, name)
+            if score > self.cutoff:
+                return name, score
+        return None, 0
+
+
+class BaseMatcher:
+    """Fuzzy stage and report shared by the matchers.
+
+    Subclasses return ``{name: key}`` from ``fuzzy_names``; the fuzzy
+    index over it is built on first use.
+    """
+
+    MATCH_TYPES = ["hash", "serial", "name", "fuzzy", "failed"]
+
+    def __init__(self):
+        self.fuzzy = None
+        self.fuzzy_keys = None
+        self.hits = Counter()
+        self.timings = Counter()
+
+    def fuzzy_names(self):
+        raise NotImplementedError
+
+    def fuzzy_lookup(self, rom):
+        """Return the key of the best fuzzy name match of ``rom``, or None."""
+        if self.fuzzy is None:
+            self.fuzzy_keys = self.fuzzy_names()
+            self.fuzzy = FuzzyIndex(self.fuzzy_keys)
+        for name in [rom.name, rom.std_name, rom.alt_name]:
+            if name is not None:
+                name, _ = self.fuzzy.extract(name)
+                if name is not None:
+                    return self.fuzzy_keys[name]
+        return None
+
+    def match(self, rom):
+        return self.match_many([rom])[0]
+
+    def report(self):
+        for match_type in self.MATCH_TYPES:
+            timing = self.timings.get(match_type)
+            timing = f"{timing * 1000:.1f} ms" if timing is not None else "-"
+            print(f"{match_type:>7}: {self.hits[match_type]:>6} hits, {timing}")
+        for stage, timing in self.timings.items():
+            if stage not in self.MATCH_TYPES:
+                print(f"{stage:>7}: {timing * 1000:.1f} ms")
+
+
+class MatchIndex(BaseMatcher):
+    """Hash maps over a metadata dict, built once per metadata load.
+
+    Every rom resolves with a few O(1) lookups, keeping the priority
+    hash > serial > name > fuzzy.
+    """
+
+    def __init__(self, metas):
+        super().__init__()
+        self.metas = metas
+        self.sha1 = {}
+        self.md5 = {}
+        self.crc32 = defaultdict(list)
+        self.serial = {}
+        self.name = {}
+        self.rom_name = {}
+
+        self.build()
+
+    def build(self):
+        for key, meta in self.metas.items():
+            for entry in self.hash_entries(meta):
+                sha1 = norm_hash(entry.get("sha1"))
+                if sha1:
+                    self.sha1.setdefault(sha1, key)
+                md5 = norm_hash(entry.get("md5"))
+                if md5:
+                    self.md5.setdefault(md5, key)
+                crc = norm_hash(entry.get("crc32", entry.get("crc")))
+                if crc:
+                    self.crc32[crc].append((norm_size(entry.get("size")), key))
+
+            serial = meta.get("serial")
+            if serial:
+                self.serial.setdefault(serial, key)
+            if meta.get("name"):
+                self.name.setdefault(meta["name"], key)
+            if meta.get("rom_name"):
+                self.rom_name.setdefault(meta["rom_name"], key)
+
+    @staticmethod
+    def hash_entries(meta):
+        # multi-file DAT games keep every rom, so each track resolves to its game
+        return meta.get("roms") or [meta]
+
+    def crc_candidates(self, crc32, size=None):
+        cands = self.crc32.get(norm_hash(crc32), [])
+        if size is not None:
+            sized = [key for s, key in cands if s == size]
+            if sized:
+                return list(dict.fromkeys(sized))
+            cands = [(s, key) for s, key in cands if s is None]
+        return list(dict.fromkeys(key for _, key in cands))
+
+    def hash_lookup(self, rom):
+        key = self.sha1.get(norm_hash(rom.sha1)) or self.md5.get(norm_hash(rom.md5))
+        if key is None and rom.crc32 is not None:
+            cands = self.crc_candidates(rom.crc32, rom.size)
+            if cands:
+                key = cands[0]
+        return key
+
+    def serial_lookup(self, rom):
+        if rom.serial is None:
+            return None
+        return self.serial.get(rom.serial)
+
+    def name_lookup(self, rom):
+        for name in [rom.name, rom.std_name, rom.alt_name]:
+            if name is not None and name in self.name:
+                return self.name[name]
+        return self.rom_name.get(rom.name)
+
+    def fuzzy_names(self):
+        return self.name
+
+    def match(self, rom):
+        """Return (match_type, meta) or (False, None)."""
+        strategies = [
+            ("hash", self.hash_lookup),
+            ("serial", self.serial_lookup),
+            ("name", self.name_lookup),
+            ("fuzzy", self.fuzzy_lookup),
+        ]
+        for match_type, lookup in strategies:
+            start = time.perf_counter()
+            key = lookup(rom)
+            self.timings[match_type] += time.perf_counter() - start
+            if key is not None:
+                self.hits[match_type] += 1
+                return match_type, self.metas[key]
+        self.hits["failed"] += 1
+        return False, None
+
+    def match_many(self, roms):
+        return [self.match(rom) for rom in roms]
+
+
+class QueryMatcher(BaseMatcher):
+    """Matcher over a queryable source such as OpenVGDB, without loading its metas.
+
+    ``match_many`` resolves every rom with one batched ``source.lookup``
+    per field, in the order sha1 > md5 > crc32 > serial > name, then
+    fuzzy-matches what is left against ``source.names()``. A crc32 is
+    first narrowed to a game with ``source.crc_games``, which keeps every
+    game sharing it, like MatchIndex.crc_candidates.
+    """
+
+    STAGES = [
+        ("hash", "sha1", lambda rom: [rom.sha1]),
+        ("hash", "md5", lambda rom: [rom.md5]),
+        ("hash", "crc", lambda rom: [rom.crc32]),
+        ("serial", "serial", lambda rom: [rom.serial]),
+        ("name", "name", lambda rom: [rom.name, rom.std_name, rom.alt_name]),
+        ("name", "rom_name", lambda rom: [rom.name]),
+    ]
+
+    def __init__(self, source):
+        super().__init__()
+        self.source = source
+
+    def crc_candidates(self, crc32, size=None):
+        return self.source.crc_games(norm_hash(crc32), size)
+
+    def match_many(self, roms):
+        results = [(False, None)] * len(roms)
+        for match_type, field, values in self.STAGES:
+            start = time.perf_counter()
+            pending = [(i, [v for v in values(rom) if v]) for i, rom in enumerate(roms) if not results[i][0]]
+            if field == "crc":
+                # every game sharing the crc32 is a candidate, narrowed by size as in MatchIndex
+                pending = [(i, self.crc_candidates(vs[0], roms[i].size)[:1]) for i, vs in pending if vs]
+                field = "name"
+            hashed = field in ("sha1", "md5")
+            found = self.source.lookup(field, [norm_hash(v) if hashed else v for _, vs in pending for v in vs])
+            for i, vs in pending:
+                for v in vs:
+                    meta = found.get(norm_hash(v) if hashed else v)
+                    if meta is None:
+                        continue
+                    results[i] = (match_type, meta)
+                    self.hits[match_type] += 1
+                    break
+            self.timings[match_type] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        fuzzy = {i: self.fuzzy_lookup(rom) for i, rom in enumerate(roms) if not results[i][0]}
+        fuzzy = {i: name for i, name in fuzzy.items() if name is not None}
+        found = self.source.lookup("name", fuzzy.values()) if fuzzy else {}
+        for i, name in fuzzy.items():
+            results[i] = ("fuzzy", found[name])
+            self.hits["fuzzy"] += 1
+        self.timings["fuzzy"] += time.perf_counter() - start
+        self.hits["failed"] += sum(1 for match_type, _ in results if not match_type)
+        return results
+
+    def fuzzy_names(self):
+        return {name: name for name in self.source.names()}
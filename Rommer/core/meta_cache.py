@@ -0,0 +1,70 @@
+import os
+import pickle
+import hashlib
+
+from ..utils.file import file_sha1
+from ..utils.cache import default_cache_dir
+
+CACHE_VERSION = 2  # bump whenever the shape of parsed metas changes
+
+
+class MetaCache:
+    """Compiled metadata cache.
+
+    Each source file (RDB, DAT, OpenVGDB, ...) is parsed once into a
+    pickle under ``cache_dir``: a small source header followed by the
+    metas, reused while the source keeps its size and mtime (or, after a
+    touch, its sha1). Cache files are replaced atomically and never
+    modified in place, so several processes can share them read-only.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.path.join(default_cache_dir(), "meta")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def cache_path(self, source_fp, variant=""):
+        key = hashlib.sha1(f"{os.path.abspath(source_fp)}|{variant}".encode()).hexdigest()[:16]
+        name = os.path.basename(source_fp).replace(".", "_")
+        return os.path.join(self.cache_dir, f"{name}.{key}.pickle")
+
+    def load(self, source_fp, loader, variant=""):
+        """Return the cached metas of ``source_fp``, compiling them with ``loader()`` when stale."""
+        cache_fp = self.cache_path(source_fp, variant)
+        metas = self.read(source_fp, cache_fp)
+        if metas is None:
+            metas = loader()
+            self.write(source_fp, cache_fp, metas)
+        return metas
+
+    def read(self, source_fp, cache_fp):
+        try:
+            with open(cache_fp, "rb") as f:
+                source = pickle.load(f)
+                st = os.stat(source_fp)
+                if source.get("version") != CACHE_VERSION or source.get("size") != st.st_size:
+                    return None
+                touched = source.get("mtime_ns") != st.st_mtime_ns
+                if touched and source.get("sha1") != file_sha1(source_fp):
+                    return None
+                metas = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            return None
+        if touched:
+            # same content under a new mtime: record it so later loads skip the sha1
+            self.write(source_fp, cache_fp, metas, source["sha1"])
+        return metas
+
+    def write(self, source_fp, cache_fp, metas, sha1=None):
+        st = os.stat(source_fp)
+        source = {
+            "version": CACHE_VERSION,
+            "path": os.path.abspath(source_fp),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha1": sha1 or file_sha1(source_fp),
+        }
+        tmp_fp = f"{cache_fp}.{os.getpid()}.tmp"
+        with open(tmp_fp, "wb") as f:
+            pickle.dump(source, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(metas, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_fp, cache_fp)
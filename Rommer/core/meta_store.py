@@ -0,0 +1,368 @@
+import os
+import json
+import time
+import threading
+
+from .match import BaseMatcher, MatchIndex, norm_hash, norm_size
+from ..utils.cache import open_db
+
+# lower rank wins when a rom hits several games:
+# sha1 0, md5 1, crc32+size 2, crc32 with unknown size 3, serial 4,
+# rom.name/std_name/alt_name 5-7, meta rom_name 8
+KEY_RANKS = {"sha1": 0, "md5": 1, "serial": 4, "name": 5, "rom_name": 8}
+
+
+def rank_type(rank):
+    if rank <= 3:
+        return "hash"
+    return "serial" if rank == 4 else "name"
+
+
+class MetaStore:
+    """One SQLite database of metas from every source and console.
+
+    Metas hitting an existing game of the same console by sha1, md5 or
+    crc32+size (or, without hashes, by name) are merged into that game.
+    Each source's copy is kept with its provenance, and lookups merge
+    them in ingestion order. Sources are re-ingested only when their
+    size or mtime changed.
+    """
+
+    def __init__(self, db_fp=None):
+        self.db_fp, self.conn = open_db(db_fp, "meta.sqlite")
+        self.lock = threading.Lock()
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sources (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL,
+                console TEXT NOT NULL,
+                file_size INTEGER,
+                mtime_ns INTEGER,
+                UNIQUE (path, console)
+            );
+            CREATE TABLE IF NOT EXISTS games (
+                id INTEGER PRIMARY KEY,
+                console TEXT NOT NULL,
+                name TEXT
+            );
+            CREATE TABLE IF NOT EXISTS provenance (
+                game_id INTEGER NOT NULL,
+                source_id INTEGER NOT NULL,
+                key TEXT,
+                meta TEXT
+            );
+            CREATE TABLE IF NOT EXISTS keys (
+                game_id INTEGER NOT NULL,
+                source_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS crcs (
+                game_id INTEGER NOT NULL,
+                source_id INTEGER NOT NULL,
+                crc32 TEXT NOT NULL,
+                size INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_games_console ON games (console);
+            CREATE INDEX IF NOT EXISTS idx_provenance_game ON provenance (game_id);
+            CREATE INDEX IF NOT EXISTS idx_provenance_source ON provenance (source_id);
+            CREATE INDEX IF NOT EXISTS idx_keys_value ON keys (kind, value);
+            CREATE INDEX IF NOT EXISTS idx_keys_source ON keys (source_id);
+            CREATE INDEX IF NOT EXISTS idx_crcs_crc ON crcs (crc32);
+            CREATE INDEX IF NOT EXISTS idx_crcs_source ON crcs (source_id);
+            """
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def console_name(console_type):
+        return getattr(console_type, "name", console_type)
+
+    def is_current(self, source_fp, console_type):
+        """Whether ``source_fp`` is stored for the console with its current size and mtime."""
+        st = os.stat(source_fp)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT file_size, mtime_ns FROM sources WHERE path = ? AND console = ?",
+                (os.path.abspath(source_fp), self.console_name(console_type)),
+            ).fetchone()
+        return row is not None and tuple(row) == (st.st_size, st.st_mtime_ns)
+
+    def ingest(self, source_fp, metas, console_type, force=False):
+        """Merge ``metas`` parsed from ``source_fp`` into the store; return the number of metas added."""
+        console = self.console_name(console_type)
+        path = os.path.abspath(source_fp)
+        st = os.stat(source_fp)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, file_size, mtime_ns FROM sources WHERE path = ? AND console = ?", (path, console)
+            ).fetchone()
+            if row is not None and not force and tuple(row[1:]) == (st.st_size, st.st_mtime_ns):
+                return 0
+
+            with self.conn:
+                if row is not None:
+                    source_id = row[0]
+                    self.drop_source(source_id)
+                    self.conn.execute(
+                        "UPDATE sources SET file_size = ?, mtime_ns = ? WHERE id = ?",
+                        (st.st_size, st.st_mtime_ns, source_id),
+                    )
+                else:
+                    source_id = self.conn.execute(
+                        "INSERT INTO sources (path, console, file_size, mtime_ns) VALUES (?, ?, ?, ?)",
+                        (path, console, st.st_size, st.st_mtime_ns),
+                    ).lastrowid
+                for key, meta in metas.items():
+                    self.add_meta(source_id, console, key, meta)
+        return len(metas)
+
+    def drop_source(self, source_id):
+        for table in ["provenance", "keys", "crcs"]:
+            self.conn.execute(f"DELETE FROM {table} WHERE source_id = ?", (source_id,))
+        self.conn.execute("DELETE FROM games WHERE id NOT IN (SELECT game_id FROM provenance)")
+
+    def find_game(self, console, keys, crcs):
+        for kind in ["sha1", "md5"]:
+            for value in keys.get(kind, []):
+                row = self.conn.execute(
+                    "SELECT k.game_id FROM keys k JOIN games g ON g.id = k.game_id "
+                    "WHERE k.kind = ? AND k.value = ? AND g.console = ? LIMIT 1",
+                    (kind, value, console),
+                ).fetchone()
+                if row:
+                    return row[0]
+        for crc32, size in crcs:
+            row = self.conn.execute(
+                "SELECT c.game_id FROM crcs c JOIN games g ON g.id = c.game_id "
+                "WHERE c.crc32 = ? AND c.size IS ? AND g.console = ? LIMIT 1",
+                (crc32, size, console),
+            ).fetchone()
+            if row:
+                return row[0]
+        if not crcs and not keys.get("sha1") and not keys.get("md5"):
+            for value in keys.get("name", []):
+                row = self.conn.execute(
+                    "SELECT k.game_id FROM keys k JOIN games g ON g.id = k.game_id "
+                    "WHERE k.kind = 'name' AND k.value = ? AND g.console = ? LIMIT 1",
+                    (value, console),
+                ).fetchone()
+                if row:
+                    return row[0]
+        return None
+
+    def add_meta(self, source_id, console, key, meta):
+        if not isinstance(meta, dict):
+            meta = dict(meta.items())
+        keys = {}
+        crcs = []
+        for entry in MatchIndex.hash_entries(meta):
+            for kind in ["sha1", "md5"]:
+                value = norm_hash(entry.get(kind))
+                if value:
+                    keys.setdefault(kind, []).append(value)
+            crc32 = norm_hash(entry.get("crc32", entry.get("crc")))
+            if crc32:
+                crcs.append((crc32, norm_size(entry.get("size"))))
+        # MAME machines keep their roms as (int crc32, size) pairs
+        for crc32, size in meta.get("rom_crcs") or ():
+            crcs.append((f"{crc32:08X}", norm_size(size)))
+        for kind in ["serial", "name", "rom_name"]:
+            if meta.get(kind):
+                keys[kind] = [str(meta[kind])]
+
+        game_id = self.find_game(console, keys, crcs)
+        if game_id is None:
+            game_id = self.conn.execute(
+                "INSERT INTO games (console, name) VALUES (?, ?)", (console, meta.get("name"))
+            ).lastrowid
+        self.conn.execute(
+            "INSERT INTO provenance (game_id, source_id, key, meta) VALUES (?, ?, ?, ?)",
+            (game_id, source_id, str(key), json.dumps(meta, default=str)),
+        )
+        self.conn.executemany(
+            "INSERT INTO keys (game_id, source_id, kind, value) VALUES (?, ?, ?, ?)",
+            [(game_id, source_id, kind, value) for kind, values in keys.items() for value in dict.fromkeys(values)],
+        )
+        self.conn.executemany(
+            "INSERT INTO crcs (game_id, source_id, crc32, size) VALUES (?, ?, ?, ?)",
+            [(game_id, source_id, crc32, size) for crc32, size in dict.fromkeys(crcs)],
+        )
+
+    def metas(self, game_ids):
+        """Return ``{game_id: meta}``, merging every source's copy with earlier sources winning."""
+        game_ids = list(set(game_ids))
+        merged = {}
+        for i in range(0, len(game_ids), 500):
+            chunk = game_ids[i : i + 500]
+            rows = self.conn.execute(
+                f"SELECT p.game_id, s.path, p.meta FROM provenance p JOIN sources s ON s.id = p.source_id "
+                f"WHERE p.game_id IN ({', '.join('?' * len(chunk))}) ORDER BY p.source_id, p.rowid",
+                chunk,
+            )
+            for game_id, path, meta in rows:
+                meta = json.loads(meta)
+                target = merged.setdefault(game_id, {"sources": []})
+                target["sources"].append(path)
+                for k, v in meta.items():
+                    target.setdefault(k, v)
+        return merged
+
+    def lookup(self, console_type, queries):
+        """Resolve many roms at once.
+
+        ``queries`` is a list of dicts with optional sha1, md5, crc32,
+        size, serial, names (in priority order) and rom_name. All of them
+        run as one SQL query over temporary tables. Returns a list of
+        ``(match_type, meta)`` or ``(False, None)`` in query order.
+        """
+        console = self.console_name(console_type)
+        key_rows, crc_rows = [], []
+        for idx, q in enumerate(queries):
+            for kind in ["sha1", "md5"]:
+                value = norm_hash(q.get(kind))
+                if value:
+                    key_rows.append((idx, kind, value, KEY_RANKS[kind]))
+            if q.get("serial"):
+                key_rows.append((idx, "serial", q["serial"], KEY_RANKS["serial"]))
+            for offset, name in enumerate(q.get("names") or []):
+                if name:
+                    key_rows.append((idx, "name", name, KEY_RANKS["name"] + offset))
+            if q.get("rom_name"):
+                key_rows.append((idx, "rom_name", q["rom_name"], KEY_RANKS["rom_name"]))
+            crc32 = norm_hash(q.get("crc32"))
+            if crc32:
+                crc_rows.append((idx, crc32, norm_size(q.get("size"))))
+
+        best = {}
+        with self.lock:
+            self.conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS q_keys (idx INTEGER, kind TEXT, value TEXT, rank INTEGER)"
+            )
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS q_crcs (idx INTEGER, crc32 TEXT, size INTEGER)")
+            self.conn.execute("DELETE FROM q_keys")
+            self.conn.execute("DELETE FROM q_crcs")
+            self.conn.executemany("INSERT INTO q_keys VALUES (?, ?, ?, ?)", key_rows)
+            self.conn.executemany("INSERT INTO q_crcs VALUES (?, ?, ?)", crc_rows)
+            rows = self.conn.execute(
+                """
+                SELECT q.idx, q.rank, k.game_id
+                FROM q_keys q
+                JOIN keys k ON k.kind = q.kind AND k.value = q.value
+                JOIN games g ON g.id = k.game_id AND g.console = ?
+                UNION ALL
+                SELECT q.idx, CASE WHEN c.size = q.size THEN 2 ELSE 3 END, c.game_id
+                FROM q_crcs q
+                JOIN crcs c ON c.crc32 = q.crc32 AND (c.size = q.size OR c.size IS NULL OR q.size IS NULL)
+                JOIN games g ON g.id = c.game_id AND g.console = ?
+                ORDER BY 1, 2, 3
+                """,
+                (console, console),
+            ).fetchall()
+            for idx, rank, game_id in rows:
+                best.setdefault(idx, (rank, game_id))
+            metas = self.metas(game_id for _, game_id in best.values())
+            self.conn.commit()
+
+        results = []
+        for idx in range(len(queries)):
+            if idx in best:
+                rank, game_id = best[idx]
+                results.append((rank_type(rank), metas[game_id]))
+            else:
+                results.append((False, None))
+        return results
+
+    def crc_games(self, console_type, crc32, size=None):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT c.game_id, c.size FROM crcs c JOIN games g ON g.id = c.game_id "
+                "WHERE c.crc32 = ? AND g.console = ?",
+                (norm_hash(crc32), self.console_name(console_type)),
+            ).fetchall()
+        if size is not None:
+            sized = [game_id for game_id, s in rows if s == size]
+            if sized:
+                return list(dict.fromkeys(sized))
+            rows = [(game_id, s) for game_id, s in rows if s is None]
+        return list(dict.fromkeys(game_id for game_id, _ in rows))
+
+    def names(self, console_type):
+        """Return ``{name: game_id}`` of every game name of the console."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT k.value, k.game_id FROM keys k JOIN games g ON g.id = k.game_id "
+                "WHERE k.kind = 'name' AND g.console = ? ORDER BY k.rowid",
+                (self.console_name(console_type),),
+            ).fetchall()
+        names = {}
+        for name, game_id in rows:
+            names.setdefault(name, game_id)
+        return names
+
+    def matcher(self, console_type):
+        return StoreMatcher(self, console_type)
+
+    def report(self):
+        for console, games, sources in self.conn.execute(
+            "SELECT g.console, COUNT(DISTINCT g.id), COUNT(DISTINCT p.source_id) "
+            "FROM games g JOIN provenance p ON p.game_id = g.id GROUP BY g.console"
+        ):
+            print(f"{console:>8}: {games:>7} games from {sources} sources")
+
+    def close(self):
+        self.conn.close()
+
+
+class StoreMatcher(BaseMatcher):
+    """MatchIndex counterpart answering from a MetaStore, one query per batch of roms.
+
+    Roms no key resolves are fuzzy-matched against the console's names.
+    """
+
+    def __init__(self, store, console_type):
+        super().__init__()
+        self.store = store
+        self.console_type = console_type
+
+    @staticmethod
+    def query(rom):
+        meta_names = [rom.name, rom.std_name, rom.alt_name]
+        return {
+            "sha1": rom.sha1,
+            "md5": rom.md5,
+            "crc32": rom.crc32,
+            "size": rom.size,
+            "serial": rom.serial,
+            "names": meta_names,
+            "rom_name": rom.name,
+        }
+
+    def crc_candidates(self, crc32, size=None):
+        return self.store.crc_games(self.console_type, crc32, size)
+
+    def fuzzy_names(self):
+        return self.store.names(self.console_type)
+
+    def match_many(self, roms):
+        start = time.perf_counter()
+        results = self.store.lookup(self.console_type, [self.query(rom) for rom in roms])
+        self.timings["lookup"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        fuzzy = {}
+        for i, (rom, (match_type, _)) in enumerate(zip(roms, results)):
+            if not match_type:
+                game_id = self.fuzzy_lookup(rom)
+                if game_id is not None:
+                    fuzzy[i] = game_id
+        if fuzzy:
+            metas = self.store.metas(fuzzy.values())
+            for i, game_id in fuzzy.items():
+                results[i] = ("fuzzy", metas[game_id])
+        self.timings["fuzzy"] += time.perf_counter() - start
+
+        for match_type, _ in results:
+            self.hits[match_type or "failed"] += 1
+        return results
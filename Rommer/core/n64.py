@@ -1,15 +1,15 @@
 class N64ByteSwapper:
     """z64 is proper format should to use for N64 roms."""
 
+    rom_formats_map = {
+        b"\x40\x12\x37\x80": "n64",  # Little Endian
+        b"\x80\x37\x12\x40": "z64",  # Big Endian
+        b"\x37\x80\x40\x12": "v64",  # Byteswapped
+    }
+
     def __init__(self, rom_path):
         self.rom_path = rom_path
 
-        self.rom_formats_map = {
-            b"\x40\x12\x37\x80": "n64",  # Little Endian
-            b"\x80\x37\x12\x40": "z64",  # Big Endian
-            b"\x37\x80\x40\x12": "v64",  # Byteswapped
-        }
-
         self.valid_type = ["n64", "z64", "v64"]
 
     def check_header(self):
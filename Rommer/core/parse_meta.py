@@ -1,8 +1,190 @@
+import io
+import os
 import csv
-import configparser
+import zipfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from sys import intern
+from struct import error as StructError
+from struct import unpack_from
 import xml.etree.ElementTree as ET
 
-from ..utils.constants import RDB_TYPE_MAP, OPENVGDB_CONSOLE_MAP
+from ..utils.constants import OPENVGDB_CONSOLE_MAP, INVERT_OPENVGDB_CONSOLE_MAP
+
+
+def _fixint(buf, p):
+    return buf[p], p + 1
+
+
+def _negfixint(buf, p):
+    return buf[p] - 0x100, p + 1
+
+
+def _const(value):
+    def decode(buf, p):
+        return value, p + 1
+
+    return decode
+
+
+def _number(fmt, size):
+    def decode(buf, p):
+        return unpack_from(fmt, buf, p + 1)[0], p + 1 + size
+
+    return decode
+
+
+def _fixstr(buf, p):
+    n = buf[p] & 0x1F
+    p += 1
+    return str(buf[p : p + n], "utf-8"), p + n
+
+
+def _str(fmt, size):
+    def decode(buf, p):
+        n = unpack_from(fmt, buf, p + 1)[0]
+        p += 1 + size
+        return str(buf[p : p + n], "utf-8"), p + n
+
+    return decode
+
+
+def _bin(fmt, size):
+    def decode(buf, p):  # zero-copy, converted by the caller once the key is known
+        n = unpack_from(fmt, buf, p + 1)[0]
+        p += 1 + size
+        return buf[p : p + n], p + n
+
+    return decode
+
+
+def _container_len(buf, p):
+    t = buf[p]
+    if t <= 0x9F:  # fixmap / fixarray
+        return t & 0x0F, p + 1
+    elif t in (0xDC, 0xDE):  # array16 / map16
+        return unpack_from(">H", buf, p + 1)[0], p + 3
+    return unpack_from(">I", buf, p + 1)[0], p + 5  # array32 / map32
+
+
+def _array(buf, p):
+    n, p = _container_len(buf, p)
+    res = []
+    for _ in range(n):
+        value, p = RDB_DECODERS[buf[p]](buf, p)
+        res.append(value)
+    return res, p
+
+
+def _map(buf, p):
+    n, p = _container_len(buf, p)
+    res = {}
+    for _ in range(n):
+        key, p = RDB_DECODERS[buf[p]](buf, p)
+        value, p = RDB_DECODERS[buf[p]](buf, p)
+        res[key] = value
+    return res, p
+
+
+def _unsupported(buf, p):
+    raise ValueError(f"Unsupported msgpack type 0x{buf[p]:02X} at {p}.")
+
+
+# dispatch table keyed on the msgpack type byte
+RDB_DECODERS = [_unsupported] * 256
+RDB_DECODERS[0x00:0x80] = [_fixint] * 0x80
+RDB_DECODERS[0x80:0x90] = [_map] * 0x10
+RDB_DECODERS[0x90:0xA0] = [_array] * 0x10
+RDB_DECODERS[0xA0:0xC0] = [_fixstr] * 0x20
+RDB_DECODERS[0xE0:0x100] = [_negfixint] * 0x20
+RDB_DECODERS[0xC0] = _const(None)
+RDB_DECODERS[0xC2] = _const(False)
+RDB_DECODERS[0xC3] = _const(True)
+RDB_DECODERS[0xC4] = _bin(">B", 1)
+RDB_DECODERS[0xC5] = _bin(">H", 2)
+RDB_DECODERS[0xC6] = _bin(">I", 4)
+RDB_DECODERS[0xCC] = _number(">B", 1)
+RDB_DECODERS[0xCD] = _number(">H", 2)
+RDB_DECODERS[0xCE] = _number(">I", 4)
+RDB_DECODERS[0xCF] = _number(">Q", 8)
+RDB_DECODERS[0xD0] = _number(">b", 1)
+RDB_DECODERS[0xD1] = _number(">h", 2)
+RDB_DECODERS[0xD2] = _number(">i", 4)
+RDB_DECODERS[0xD3] = _number(">q", 8)
+RDB_DECODERS[0xD9] = _str(">B", 1)
+RDB_DECODERS[0xDA] = _str(">H", 2)
+RDB_DECODERS[0xDB] = _str(">I", 4)
+RDB_DECODERS[0xDC] = _array
+RDB_DECODERS[0xDD] = _array
+RDB_DECODERS[0xDE] = _map
+RDB_DECODERS[0xDF] = _map
+
+
+def _skip_one(buf, p):
+    return p + 1
+
+
+def _skip_fixed(size):
+    def skip(buf, p):
+        return p + 1 + size
+
+    return skip
+
+
+def _skip_fixstr(buf, p):
+    return p + 1 + (buf[p] & 0x1F)
+
+
+def _skip_sized(fmt, size):
+    def skip(buf, p):
+        return p + 1 + size + unpack_from(fmt, buf, p + 1)[0]
+
+    return skip
+
+
+def _skip_array(buf, p):
+    n, p = _container_len(buf, p)
+    for _ in range(n):
+        p = RDB_SKIPPERS[buf[p]](buf, p)
+    return p
+
+
+def _skip_map(buf, p):
+    n, p = _container_len(buf, p)
+    for _ in range(2 * n):
+        p = RDB_SKIPPERS[buf[p]](buf, p)
+    return p
+
+
+# same layout as RDB_DECODERS, but only advance past a value without decoding it
+RDB_SKIPPERS = [_unsupported] * 256
+RDB_SKIPPERS[0x00:0x80] = [_skip_one] * 0x80
+RDB_SKIPPERS[0x80:0x90] = [_skip_map] * 0x10
+RDB_SKIPPERS[0x90:0xA0] = [_skip_array] * 0x10
+RDB_SKIPPERS[0xA0:0xC0] = [_skip_fixstr] * 0x20
+RDB_SKIPPERS[0xE0:0x100] = [_skip_one] * 0x20
+RDB_SKIPPERS[0xC0] = _skip_one
+RDB_SKIPPERS[0xC2] = _skip_one
+RDB_SKIPPERS[0xC3] = _skip_one
+RDB_SKIPPERS[0xC4] = _skip_sized(">B", 1)
+RDB_SKIPPERS[0xC5] = _skip_sized(">H", 2)
+RDB_SKIPPERS[0xC6] = _skip_sized(">I", 4)
+RDB_SKIPPERS[0xCC] = _skip_fixed(1)
+RDB_SKIPPERS[0xCD] = _skip_fixed(2)
+RDB_SKIPPERS[0xCE] = _skip_fixed(4)
+RDB_SKIPPERS[0xCF] = _skip_fixed(8)
+RDB_SKIPPERS[0xD0] = _skip_fixed(1)
+RDB_SKIPPERS[0xD1] = _skip_fixed(2)
+RDB_SKIPPERS[0xD2] = _skip_fixed(4)
+RDB_SKIPPERS[0xD3] = _skip_fixed(8)
+RDB_SKIPPERS[0xD9] = _skip_sized(">B", 1)
+RDB_SKIPPERS[0xDA] = _skip_sized(">H", 2)
+RDB_SKIPPERS[0xDB] = _skip_sized(">I", 4)
+RDB_SKIPPERS[0xDC] = _skip_array
+RDB_SKIPPERS[0xDD] = _skip_array
+RDB_SKIPPERS[0xDE] = _skip_map
+RDB_SKIPPERS[0xDF] = _skip_map
 
 
 class RDB:
@@ -10,15 +192,17 @@ class RDB:
     https://github.com/libretro/libretro-database
     """
 
-    def __init__(self, rdb_fp):
+    def __init__(self, rdb_fp, fields=None, lazy=False):
         self.data = None
         self.maxlen = 0
         self.parsed_data = {}
         self.expect_num = 0
 
         self.rdb_fp = rdb_fp
+        self.fields = fields
         self.load_rdb()
-        self.parse_rdb()
+        if not lazy:
+            self.parse_rdb()
 
     def load_rdb(self):
         with open(self.rdb_fp, "rb") as f:
@@ -28,123 +212,183 @@ class RDB:
         self.data = data
         self.maxlen = len(self.data)
 
-    def parse_rdb(self):
-        def to_int(data):
-            return int.from_bytes(data, byteorder="big")
-
-        def get_rom(p):
-            rom_indicator = to_int(self.data[p : p + 1])
-            if rom_indicator == 0xDE:
-                content_len = to_int(self.data[p : p + 3]) - 0xDE0000
-                p += 3
-            else:
-                content_len = rom_indicator - 0x80
-                p += 1
-            return p, content_len
-
-        def get_str(p):
-            str_indicator = to_int(self.data[p : p + 1])
-            if str_indicator == 0xD9:  # two bytes length indicator
-                next_len = to_int(self.data[p : p + 2]) - 0xD900
-                p += 2
-            elif str_indicator == 0xDA:  # three bytes length indicator
-                next_len = to_int(self.data[p : p + 3]) - 0xDA0000
-                p += 3
-            else:  # one byte length indicator
-                next_len = str_indicator - 0xA0
-                p += 1
-            content = self.data[p : p + next_len].decode("utf-8")
-            p += next_len
-            return p, content
-
-        def get_int(p):
-            int_indicator = to_int(self.data[p : p + 1])
-            next_len = 2 ** (int_indicator - 0xCC)  # one byte length indicator
-            p += 1
-            content = to_int(self.data[p : p + next_len])
-            p += next_len
-            return p, content
-
-        def get_bytes(p):
-            bytes_indicator = to_int(self.data[p : p + 1])
-            if bytes_indicator == 0xC4:  # two bytes length indicator
-                next_len = to_int(self.data[p : p + 2]) - 0xC400
-                p += 2
-            content = self.data[p : p + next_len]
-            p += next_len
-            if key == "serial":
-                try:
-                    content = content.decode("utf-8")
-                except UnicodeDecodeError:
-                    content = content.hex().upper()
-            else:
-                content = content.hex().upper()
-            return p, content
+    @staticmethod
+    def decode_bin(key, value):
+        if key == "serial":
+            try:
+                return str(value, "utf-8")
+            except UnicodeDecodeError:
+                pass
+        return value.hex().upper()
+
+    def iter_records(self, fields=None, predicate=None):
+        """Yield records one at a time.
+
+        Only keys in ``fields`` are decoded, every other value is skipped
+        without being decoded or hex-encoded. ``predicate`` receives the
+        projected record, so it can only look at projected fields.
+        """
+        data = self.data
+        buf = memoryview(data)
+        decoders = RDB_DECODERS
+        skippers = RDB_SKIPPERS
+        decode_bin = self.decode_bin
+        fields = frozenset(fields) if fields is not None else None
+        keys = {}  # raw key bytes -> interned str; keys are short, so a bytes slice hashes cheaper than a view
 
         p = 16
-        res = []
-
-        while p < self.maxlen - 16:
+        while p < self.maxlen:
+            t = buf[p]
+            if not (0x80 <= t <= 0x8F or t == 0xDE or t == 0xDF):
+                break
             rom = {}
-            p, content_len = get_rom(p)
-            for _ in range(content_len):
-                p, key = get_str(p)
-                # get value
-                if RDB_TYPE_MAP[key] is str:
-                    p, content = get_str(p)
-                elif RDB_TYPE_MAP[key] is int:
-                    p, content = get_int(p)
-                elif RDB_TYPE_MAP[key] is bytes:
-                    p, content = get_bytes(p)
-                rom[key] = content
-            res.append(rom)
-
-        # get count num
-        count_index = self.data.find(b"count", p, self.maxlen)
-        if self.maxlen - count_index > 5:
-            p = count_index + 5
-            _, self.expect_num = get_int(p)
+            n, p = _container_len(buf, p)
+            for _ in range(n):
+                t = buf[p]
+                if 0xA0 <= t <= 0xBF:
+                    size, p = t & 0x1F, p + 1
+                    raw = data[p : p + size]
+                    key = keys.get(raw)
+                    if key is None:
+                        key = keys[raw] = intern(raw.decode("utf-8"))
+                    p += size
+                else:
+                    key, p = decoders[t](buf, p)
+                if fields is not None and key not in fields:
+                    p = skippers[buf[p]](buf, p)
+                    continue
+                value, p = decoders[buf[p]](buf, p)
+                if type(value) is memoryview:
+                    value = decode_bin(key, value)
+                rom[key] = value
+            if predicate is None or predicate(rom):
+                yield rom
+
+        # records end with nil, followed by a metadata map holding the count
+        if p < self.maxlen and buf[p] == 0xC0 and p + 1 < self.maxlen:
+            try:
+                meta, _ = decoders[buf[p + 1]](buf, p + 1)
+                self.expect_num = meta.get("count", 0) if isinstance(meta, dict) else 0
+            except (ValueError, IndexError, StructError):
+                pass
 
+    def parse_rdb(self):
+        fields = None if self.fields is None else {"name", *self.fields}
         # filter useless data
-        self.parsed_data = {r["name"]: r for r in res if "name" in r}
+        self.parsed_data = {r["name"]: r for r in self.iter_records(fields) if "name" in r}
 
 
 class DAT:
-    """For No-Intro and Redump DAT file
+    """For No-Intro and Redump DAT file, plain or inside the zip Redump serves
     https://no-intro.org
     http://redump.org
     """
 
-    def __init__(self, dat_fp):
+    def __init__(self, dat_fp, lazy=False):
         self.parsed_data = {}
         self.header = {}
+        self.rom_index = {}  # ("sha1", v) / ("md5", v) / ("crc", v, size) -> (game name, rom entry)
 
         self.dat_fp = dat_fp
-        self.parse_dat()
+        if not lazy:
+            self.parse_dat()
+
+    @contextmanager
+    def open_dat(self):
+        if not zipfile.is_zipfile(self.dat_fp):
+            with open(self.dat_fp, "rb") as f:
+                yield f
+            return
+        with zipfile.ZipFile(self.dat_fp, "r") as z:
+            names = [n for n in z.namelist() if n.lower().endswith(".dat") and "__MACOSX" not in n]
+            if not names:
+                raise ValueError(f"No dat file in {self.dat_fp}.")
+            with z.open(names[0]) as f:
+                yield f
+
+    def iter_games(self):
+        """Yield one meta dict per game, clearing each element once it is read."""
+        with self.open_dat() as f:
+            context = ET.iterparse(f, events=("start", "end"))
+            _, root = next(context)
+            for event, elem in context:
+                if event != "end":
+                    continue
+                if elem.tag == "header":
+                    for child in elem:
+                        self.header[child.tag] = child.text
+                    root.clear()
+                elif elem.tag == "game":
+                    meta = {}
+                    meta.update(elem.attrib)
+                    roms = []
+                    for child in elem:
+                        if child.tag == "rom":
+                            rom = dict(child.attrib)
+                            rom["rom_name"] = rom.pop("name")
+                            meta.update(rom)  # the last rom stays flattened into the game
+                            roms.append(rom)
+                        else:
+                            meta[child.tag] = child.text
+                    if roms:
+                        meta["roms"] = roms
+                    root.clear()  # drops the finished game and its children
+
+                    if "name" in meta:
+                        yield meta
 
     def parse_dat(self):
-        tree = ET.parse(self.dat_fp)
-        root = tree.getroot()
-
-        # parse header
-        _header = root.find("header")
-        if _header is not None:
-            for child in _header:
-                self.header[child.tag] = child.text
-
-        # parse games
-        for game in root.findall("game"):
-            meta = {}
-            meta.update(game.attrib)
-            for child in game:
-                if child.tag == "rom":
-                    child.attrib["rom_name"] = child.attrib.pop("name")
-                    meta.update(child.attrib)
-                else:
-                    meta[child.tag] = child.text
-
-            if "name" in meta:
-                self.parsed_data[meta["name"]] = meta
+        for meta in self.iter_games():
+            self.parsed_data[meta["name"]] = meta
+            self.index_game(meta)
+
+    @staticmethod
+    def rom_keys(crc=None, md5=None, sha1=None, size=None):
+        """Lookup keys, best first: sha1, md5, crc32+size, then crc32 of an entry without size."""
+        keys = []
+        if sha1:
+            keys.append(("sha1", sha1.upper()))
+        if md5:
+            keys.append(("md5", md5.upper()))
+        if crc:
+            size = int(size) if size not in (None, "") else None
+            if size is not None:
+                keys.append(("crc", crc.upper(), size))
+            keys.append(("crc", crc.upper(), None))
+        return keys
+
+    def index_game(self, meta):
+        for rom in meta.get("roms", []):
+            for key in self.rom_keys(rom.get("crc"), rom.get("md5"), rom.get("sha1"), rom.get("size")):
+                self.rom_index.setdefault(key, (meta["name"], rom))
+
+    def lookup(self, crc=None, md5=None, sha1=None, size=None):
+        """Resolve any single track or file to (game name, rom entry), or None.
+
+        Without ``size`` a crc32 alone matches; with it, the sizes must agree
+        unless the DAT entry has no size.
+        """
+        for key in self.rom_keys(crc, md5, sha1, size):
+            hit = self.rom_index.get(key)
+            if hit is None:
+                continue
+            # the size-less crc key holds any entry with that crc; only trust it when no size disagrees
+            if key[-1] is None and size not in (None, "") and hit[1].get("size") not in (None, ""):
+                continue
+            return hit
+        return None
+
+    def missing_roms(self, name, digests):
+        """Rom entries of a game not covered by ``digests`` (crc/md5/sha1 strings)."""
+        digests = {d.upper() for d in digests if d}
+        return [
+            rom
+            for rom in self.parsed_data[name].get("roms", [])
+            if not any((rom.get(k) or "").upper() in digests for k in ("sha1", "md5", "crc"))
+        ]
+
+    def is_complete(self, name, digests):
+        return not self.missing_roms(name, digests)
 
 
 class SQLite:
@@ -152,6 +396,46 @@ class SQLite:
     https://github.com/OpenVGDB/OpenVGDB
     """
 
+    SELECT = """
+        SELECT
+            romExtensionlessFileName name,
+            romFileName rom_name,
+            romLanguage language,
+            TEMPromRegion region,
+            releaseDeveloper developer,
+            releasePublisher publisher,
+            releaseDescription description,
+            releaseGenre genre,
+            releaseDate year,
+            romSize size,
+            romSerial serial,
+            romHashCRC crc,
+            romHashMD5 md5,
+            romHashSHA1 sha1,
+            romDumpSource source,
+            releaseCoverFront cover_url,
+            TEMPsystemName console_type
+        FROM ROMs a
+        INNER JOIN (
+            SELECT
+                romID,
+                releaseCoverFront,
+                releaseDescription,
+                releaseDeveloper,
+                releasePublisher,
+                releaseGenre,
+                TEMPsystemName,
+                SUBSTR(releaseDate, -4) releaseDate,
+                releaseReferenceURL,
+                releaseReferenceImageURL
+            FROM
+                RELEASES
+            {release_filter}
+            GROUP BY romID
+        ) b
+        ON a.romID = b.romID
+        """
+
     def __init__(self, db_fp):
         self.db_fp = db_fp
         self.conn = None
@@ -167,54 +451,193 @@ class SQLite:
         self.conn = sqlite3.connect(self.db_fp)
         self.cursor = self.conn.cursor()
 
-    def parse(self):
-        sql = """
-            SELECT 
-                romExtensionlessFileName name,
-                romFileName rom_name,
-                romLanguage language,
-                TEMPromRegion region,
-                releaseDeveloper developer,
-                releasePublisher publisher,
-                releaseDescription description,
-                releaseGenre genre,
-                releaseDate year,
-                romSize size,
-                romSerial serial,
-                romHashCRC crc,
-                romHashMD5 md5,
-                romHashSHA1 sha1,
-                romDumpSource source,
-                releaseCoverFront cover_url,
-                TEMPsystemName console_type
-            FROM ROMs a
-            INNER JOIN (
-                SELECT 
-                    romID,
-                    releaseCoverFront,
-                    releaseDescription,
-                    releaseDeveloper,
-                    releasePublisher,
-                    releaseGenre,
-                    TEMPsystemName,
-                    SUBSTR(releaseDate, -4) releaseDate,
-                    releaseReferenceURL,
-                    releaseReferenceImageURL
-                FROM
-                    RELEASES 
-                GROUP BY romID
-            ) b
-            ON a.romID = b.romID
-            """
-        self.cursor.execute(sql)
-        rows = self.cursor.fetchall()
-        columns = [name[0] for name in self.cursor.description]
-        parsed_data = [dict(zip(columns, row)) for row in rows]
-        for meta in parsed_data:
+    def to_metas(self, cursor):
+        columns = [name[0] for name in cursor.description]
+        metas = [dict(zip(columns, row)) for row in cursor]
+        for meta in metas:
             meta["console_type"] = OPENVGDB_CONSOLE_MAP.get(meta["console_type"], None)
+        return metas
+
+    def parse(self):
+        self.cursor.execute(self.SELECT.format(release_filter=""))
+        for meta in self.to_metas(self.cursor):
+            if "name" in meta:
+                self.parsed_data[meta["name"]] = meta
+
+
+class OpenVGDB(SQLite):
+    """Query-based OpenVGDB backend.
+
+    Console filtering runs in SQL on ``TEMPsystemName``, hash/serial/name
+    columns get indexes, and per-rom lookups are batched parameterized
+    ``IN (...)`` queries. Connections are shared per database file, so
+    several RomSet instances reuse one.
+    """
+
+    BATCH = 500
+    LOOKUP_COLUMNS = {
+        "sha1": "a.romHashSHA1",
+        "md5": "a.romHashMD5",
+        "crc": "a.romHashCRC",
+        "serial": "a.romSerial",
+        "name": "a.romExtensionlessFileName",
+        "rom_name": "a.romFileName",
+    }
+    INDEXES = {
+        "idx_roms_sha1": "ROMs(romHashSHA1)",
+        "idx_roms_md5": "ROMs(romHashMD5)",
+        "idx_roms_crc": "ROMs(romHashCRC)",
+        "idx_roms_serial": "ROMs(romSerial)",
+        "idx_roms_name": "ROMs(romExtensionlessFileName)",
+        "idx_roms_file_name": "ROMs(romFileName)",
+        "idx_releases_rom": "RELEASES(romID)",
+        "idx_releases_system": "RELEASES(TEMPsystemName, romID)",
+    }
+
+    connections = {}
+    connections_lock = threading.Lock()
+
+    def __init__(self, db_fp, console_type=None, lazy=False):
+        self.console_type = console_type
+        systems = INVERT_OPENVGDB_CONSOLE_MAP.get(console_type, []) if console_type is not None else None
+        self.systems = [systems] if isinstance(systems, str) else systems
+
+        self.db_fp = db_fp
+        self.conn = None
+        self.cursor = None
+        self.parsed_data = {}
+
+        self.connect()
+        if not lazy:
+            self.parse()
+
+    def connect(self):
+        import sqlite3
+
+        key = os.path.abspath(self.db_fp)
+        with self.connections_lock:
+            if key not in self.connections:
+                conn = sqlite3.connect(key, check_same_thread=False)
+                existing = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+                missing = {name: target for name, target in self.INDEXES.items() if name not in existing}
+                if missing:
+                    # the indexes are written into the OpenVGDB file itself, once
+                    print(f"Adding {len(missing)} lookup indexes to {key}.")
+                    try:
+                        for name, target in missing.items():
+                            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+                        conn.commit()
+                    except sqlite3.OperationalError as e:
+                        conn.rollback()
+                        print(f"Warning: could not index {key} ({e}), querying without indexes.")
+                self.connections[key] = conn
+        self.conn = self.connections[key]
+        self.cursor = self.conn.cursor()
+
+    def select(self, where="", params=()):
+        release_filter, filter_params = "", []
+        if self.systems is not None:
+            release_filter = f"WHERE TEMPsystemName IN ({', '.join('?' * len(self.systems))})"
+            filter_params = list(self.systems)
+        sql = self.SELECT.format(release_filter=release_filter) + where
+        return self.to_metas(self.conn.execute(sql, [*filter_params, *params]))
+
+    def parse(self):
+        if self.systems == []:
+            return
+        for meta in self.select():
             if "name" in meta:
                 self.parsed_data[meta["name"]] = meta
 
+    def lookup(self, field, values):
+        """Batch lookup by sha1/md5/crc/serial/name, returning {value: meta}."""
+        column = self.LOOKUP_COLUMNS[field]
+        values = list(dict.fromkeys(v for v in values if v))
+        if field in ("sha1", "md5", "crc"):
+            values = [v.upper() for v in values]
+        res = {}
+        if self.systems == []:
+            return res
+        for i in range(0, len(values), self.BATCH):
+            batch = values[i : i + self.BATCH]
+            where = f" WHERE {column} IN ({', '.join('?' * len(batch))})"
+            for meta in self.select(where, batch):
+                res.setdefault(meta[field], meta)
+        return res
+
+    def crc_games(self, crc32, size=None):
+        """Names of every game with this crc32, narrowed to ``size`` when some entry has it."""
+        if self.systems == []:
+            return []
+        rows = [(meta["name"], meta.get("size")) for meta in self.select(" WHERE a.romHashCRC = ?", [crc32.upper()])]
+        if size is not None:
+            sized = [name for name, s in rows if s == size]
+            if sized:
+                return list(dict.fromkeys(sized))
+            rows = [(name, s) for name, s in rows if s is None]
+        return list(dict.fromkeys(name for name, _ in rows))
+
+    def names(self):
+        """Every game name of the console, for fuzzy matching without loading the metas."""
+        if self.systems == []:
+            return []
+        return [meta["name"] for meta in self.select() if meta.get("name")]
+
+
+class MameMachine:
+    """Compact MAME record: fixed slots plus a dict for INI annotations.
+
+    Supports the dict-style access the rest of the code uses on metas.
+    ``rom_crcs`` is a tuple of (crc32 int, size) pairs.
+    """
+
+    __slots__ = ("name", "cloneof", "romof", "description", "year", "manufacturer", "rom_crcs", "extra")
+    FIELDS = ("name", "cloneof", "romof", "description", "year", "manufacturer", "rom_crcs")
+
+    def __init__(self, name, cloneof=None, romof=None, description=None, year=None, manufacturer=None, rom_crcs=()):
+        self.name = name
+        self.cloneof = cloneof
+        self.romof = romof
+        self.description = description
+        self.year = year
+        self.manufacturer = manufacturer
+        self.rom_crcs = rom_crcs
+        self.extra = None
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def keys(self):
+        return [k for k in (*self.FIELDS, *(self.extra or {})) if k in self]
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def __repr__(self):
+        return f"MameMachine({dict(self.items())!r})"
+
 
 class MAME:
     """For MAME XML file
@@ -228,20 +651,104 @@ class MAME:
         self.parse_dat()
 
     def parse_dat(self):
-        context = ET.iterparse(self.dat_fp, events=("start",))
-        next(context)  # skip root
-        tags = ["description", "year", "manufacturer"]
-        for _, elem in context:
-            if elem.tag in ["machine", "game"]:
-                meta = elem.attrib
-                self.parsed_data[meta["name"]] = meta
-            elif elem.tag in tags:
-                meta[elem.tag] = elem.text
+        """Stream ``end`` events and drop each finished machine from the tree."""
+        context = ET.iterparse(self.dat_fp, events=("start", "end"))
+        _, root = next(context)  # root
+        for event, elem in context:
+            if event != "end" or elem.tag not in ("machine", "game"):
+                continue
+            attrib = elem.attrib
+            name = attrib.get("name")
+            if name is not None:
+                fields = {}
+                rom_crcs = []
+                for child in elem:
+                    tag = child.tag
+                    if tag == "description":
+                        fields[tag] = child.text
+                    elif tag in ("year", "manufacturer") and child.text:
+                        fields[tag] = intern(child.text)
+                    elif tag == "rom" and "crc" in child.attrib:
+                        rom_crcs.append((int(child.attrib["crc"], 16), int(child.attrib.get("size", 0))))
+                self.parsed_data[name] = MameMachine(
+                    intern(name),
+                    cloneof=attrib.get("cloneof") and intern(attrib["cloneof"]),
+                    romof=attrib.get("romof") and intern(attrib["romof"]),
+                    rom_crcs=tuple(rom_crcs),
+                    **fields,
+                )
+            elem.clear()
+            root.clear()
 
     def parse_ini_file(self, ini_fp, key):
-        config = configparser.ConfigParser(allow_no_value=True, strict=False)
-        config.read(ini_fp, encoding="utf-8")
-        for section in config.sections():
-            for name, _ in config.items(section):
-                if name in self.parsed_data:
-                    self.parsed_data[name][key] = section
+        """Annotate machines with one progettoSnaps INI file (or a zip holding it)."""
+        for name, value in iter_ini(ini_fp, key):
+            meta = self.parsed_data.get(name)
+            if meta is not None:
+                meta[key] = value
+
+    def parse_ini_files(self, sources, workers=1):
+        """Annotate machines from ``{key: ini or zip path}``, reading files on a process pool."""
+        if workers <= 1:
+            for key, ini_fp in sources.items():
+                self.parse_ini_file(ini_fp, key)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            names = set(self.parsed_data)
+            futures = {key: pool.submit(read_ini, ini_fp, key, names) for key, ini_fp in sources.items()}
+            for key, future in futures.items():
+                for name, value in future.result():
+                    self.parsed_data[name][key] = value
+
+
+INI_SKIP_SECTIONS = {"FOLDER_SETTINGS", "ROOT_FOLDER"}
+
+
+@contextmanager
+def open_ini(ini_fp, key=None):
+    """Open an INI file as text; for a zip, pick ``{key}.ini`` or its first INI member."""
+    if not zipfile.is_zipfile(ini_fp):
+        with open(ini_fp, encoding="utf-8-sig", errors="replace") as f:
+            yield f
+        return
+    with zipfile.ZipFile(ini_fp, "r") as z:
+        names = [n for n in z.namelist() if n.lower().endswith(".ini") and "__MACOSX" not in n]
+        if not names:
+            raise ValueError(f"No ini file in {ini_fp}.")
+        wanted = [n for n in names if key and os.path.basename(n).lower() == f"{key.lower()}.ini"]
+        with z.open((wanted or names)[0]) as raw:
+            yield io.TextIOWrapper(raw, encoding="utf-8-sig", errors="replace")
+
+
+def iter_ini(ini_fp, key=None):
+    """Stream ``(machine, value)`` pairs from a progettoSnaps INI file.
+
+    Bare entries (series, languages, ...) take their section as value,
+    ``name=value`` entries (catver.ini) take their value. Only the first
+    ``name=value`` section is read, so catver.ini's ``[VerAdded]`` does
+    not overwrite ``[Category]``.
+    """
+    section = None
+    valued = False
+    with open_ini(ini_fp, key) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line[0] in ";#":
+                continue
+            if line[0] == "[":
+                if valued:
+                    break
+                section = line[1:].split("]", 1)[0].strip()
+                if section in INI_SKIP_SECTIONS:
+                    section = None
+                continue
+            if section is None:
+                continue
+            name, sep, value = line.partition("=")
+            valued = valued or bool(sep)
+            yield name.strip().lower(), intern(value.strip()) if sep else intern(section)
+
+
+def read_ini(ini_fp, key=None, names=None):
+    """Pool worker: the pairs of one INI file, keeping only ``names`` when given."""
+    return [(n, v) for n, v in iter_ini(ini_fp, key) if names is None or n in names]
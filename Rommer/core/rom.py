@@ -1,47 +1,155 @@
+import io
 import os
-import re
 import sys
+import time
 import shutil
+from contextlib import nullcontext, suppress
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from fuzzywuzzy import process
-
+from .iso import WindowedSearch, disc_serial
 from .n64 import N64ByteSwapper
+from .match import MatchIndex, QueryMatcher
+from .meta_cache import MetaCache
+from .meta_store import MetaStore
 from ..utils import file as fh
-from .parse_meta import DAT, RDB, SQLite
+from ..utils.pool import ByteBudget, HostRateLimiter
+from ..utils.scan import scan_roms
+from ..utils.cache import NO_SERIAL, HashCache, MissCache
+from ..utils.media import MediaStore
+from .parse_meta import DAT, RDB, OpenVGDB
 from ..utils.spider import download_libretro_boxart
-from ..utils.constants import ConsoleType
+from ..utils.constants import ConsoleType, RomDataType
 
 import pandas as pd
 
 
 class RomSet:
-    def __init__(self, console_type: ConsoleType):
+    def __init__(
+        self,
+        console_type: ConsoleType,
+        hash_cache: HashCache = None,
+        meta_cache: MetaCache = None,
+        meta_store: MetaStore = None,
+        miss_cache: MissCache = None,
+        media_store: MediaStore = None,
+    ):
         self.metas = {}
         self.roms = {}
+        self.roots = []
+        self.matcher = None
+        self.hash_cache = hash_cache
+        self.meta_cache = meta_cache
+        self.meta_store = meta_store
+        self.miss_cache = miss_cache
+        self.media_store = media_store
         self.console_type = console_type
 
-    def add_metas(self, meta_path):
+    def parse_metas(self, meta_path):
+        metas = {}
         if meta_path.endswith(".rdb"):
-            self.metas = RDB(meta_path).parsed_data
-        elif meta_path.endswith(".dat"):
-            self.metas = DAT(meta_path).parsed_data
+            metas = RDB(meta_path).parsed_data
+        elif meta_path.endswith(".dat") or meta_path.endswith(".zip"):
+            metas = DAT(meta_path).parsed_data
         elif meta_path.endswith(".sqlite"):
-            meta = SQLite(meta_path)  # allredy have console_type
-            for g in meta.parsed_data:
-                if g["console_type"] == self.console_type:
-                    self.metas[g["name"]] = g
+            metas = OpenVGDB(meta_path, self.console_type).parsed_data
+        return metas
+
+    def add_metas(self, meta_path):
+        """Load a metadata source; with a meta_store every source added is kept and matched together.
+
+        Without a meta_store an OpenVGDB is not loaded at all but queried in
+        batches at match time.
+        """
+        if self.meta_store is None and meta_path.endswith(".sqlite"):
+            self.metas = {}
+            self.matcher = QueryMatcher(OpenVGDB(meta_path, self.console_type, lazy=True))
+            print(f"Added {meta_path} for batched lookups.")
+            return
+        if self.meta_store is not None and self.meta_store.is_current(meta_path, self.console_type):
+            # already ingested unchanged, matching needs nothing parsed
+            self.metas = {}
+            self.matcher = self.meta_store.matcher(self.console_type)
+            print(f"Metadata of {meta_path} is up to date in the meta store.")
+            return
+        if self.meta_cache is not None:
+            # OpenVGDB holds every console, so its cache is compiled per console
+            variant = self.console_type.name if meta_path.endswith(".sqlite") else ""
+            self.metas = self.meta_cache.load(meta_path, lambda: self.parse_metas(meta_path), variant)
+        else:
+            self.metas = self.parse_metas(meta_path)
+        if self.meta_store is not None:
+            self.meta_store.ingest(meta_path, self.metas, self.console_type)
+            self.matcher = self.meta_store.matcher(self.console_type)
+        else:
+            self.matcher = MatchIndex(self.metas)
         print(f"Added {len(self.metas)} metadata.")
 
-    def add_rom(self, rom_path):
+    def add_rom(self, rom_path, member=None, entry=None):
         SmartRom = getattr(sys.modules[__name__], self.console_type.name, BaseRom)
-        r = SmartRom(rom_path, self.console_type)
+        r = SmartRom(rom_path, self.console_type, cache=self.hash_cache, member=member, entry=entry)
         self.roms[r.name] = r
-
-    def add_roms(self, folder_paths, valid_extensions):
-        for r, _, f in os.walk(folder_paths):
-            for file in f:
-                if file.split(".")[-1].lower() in valid_extensions:
-                    self.add_rom(os.path.join(r, file))
+        return r
+
+    def add_archive(self, rom_path, valid_extensions, entry=None):
+        """Add an archive without opening it; its members are listed on the first scan.
+
+        Listing is only needed when some valid extension is not an
+        archive one, i.e. when members could be roms of their own.
+        """
+        rom = self.add_rom(rom_path, entry=entry)
+        member_extensions = {e for e in valid_extensions if e not in fh.ARCHIVE_EXTENSIONS}
+        if member_extensions:
+            rom.expand_extensions = member_extensions
+
+    def expand_archive(self, rom):
+        """Return one rom per member of a multi-rom archive, or ``[rom]``.
+
+        An archive with a single rom member among other files keeps its
+        name but reads that member, not the archive's first file.
+        """
+        extensions, rom.expand_extensions = rom.expand_extensions, None
+        try:
+            filetype = rom.get_filetype()
+            if filetype == RomDataType.ZIP:
+                members = fh.list_zip(rom.rom_path)
+            elif filetype == RomDataType.RAR:
+                members = fh.list_rar(rom.rom_path)
+            elif filetype == RomDataType._7Z:
+                members = fh.list_7z(rom.rom_path)
+            else:
+                members = []
+        except Exception as e:
+            print(f"Error: {e}")
+            members = []
+
+        members = [m for m in members if m.split(".")[-1].lower() in extensions]
+        if not members:
+            return [rom]
+        if len(members) == 1:
+            rom.member = members[0]
+            rom.cached = rom.header = None  # both are keyed by the member
+            return [rom]
+        SmartRom = type(rom)
+        return [
+            SmartRom(rom.rom_path, self.console_type, cache=self.hash_cache, member=member, entry=rom.entry)
+            for member in members
+        ]
+
+    def add_roms(self, folder_paths, valid_extensions, include=None, exclude=None, workers=1, max_listing=4):
+        """Add roms found under ``folder_paths``.
+
+        ``include``/``exclude`` are glob patterns matched against the path
+        relative to ``folder_paths`` or the file name. ``workers`` lists
+        subdirectories in parallel, with at most ``max_listing`` listings
+        in flight. No rom file is opened here.
+        """
+        valid_extensions = [e.lower() for e in valid_extensions]
+        self.roots.append(folder_paths)
+        for entry in scan_roms(folder_paths, valid_extensions, include, exclude, workers, max_listing):
+            if entry.extension in fh.ARCHIVE_EXTENSIONS:
+                self.add_archive(entry.path, valid_extensions, entry)
+            else:
+                self.add_rom(entry.path, entry=entry)
         print(f"Added {len(self.roms)} roms.")
 
     def set_meta_for_roms(self, meta_path):
@@ -58,68 +166,81 @@ class RomSet:
 
         print(f"Set meta for {count} roms.")
 
-    def hash_match(self, rom, meta):
-        return any(
-            [
-                rom.sha1 == meta.get("sha1", " ").upper(),
-                rom.md5 == meta.get("md5", " ").upper(),
-                rom.crc32 == meta.get("crc32", " ").upper(),
+    def scan_roms(self, roms, use_hash=False, use_serial=False, fast_crc=False):
+        """Scan roms sharing one archive, decoding its members in a single pass.
+
+        An archive not listed yet is first expanded into its members; the
+        scanned roms are returned.
+        """
+        if len(roms) == 1 and roms[0].expand_extensions is not None:
+            roms = self.expand_archive(roms[0])
+        if use_hash:
+            # a unique crc32+size hit from the archive directory needs no decompression
+            pending = [
+                rom
+                for rom in roms
+                if not fast_crc or not rom.get_crc() or len(self.matcher.crc_candidates(rom.crc32, rom.size)) > 1
             ]
-        )
-
-    def serial_match(self, rom, meta):
-        return rom.serial == meta.get("serial", " ")
-
-    def name_match(self, rom, meta):
-        return any(
-            [
-                rom.name == meta.get("name", " "),
-                rom.std_name == meta.get("name", " "),
-                rom.alt_name == meta.get("name", " "),
-                rom.name == meta.get("rom_name", " "),
-            ]
-        )
-
-    def fuzzy_match(self, rom, dsts):
-        for name in [rom.name, rom.std_name, rom.alt_name]:
-            if name is not None:
-                name, score = process.extractOne(name, dsts)
-                if score > 95:
-                    return "fuzzy", name
-        return False, " "
-
-    def match_by_type(self, rom, meta):
-        if self.hash_match(rom, meta):
-            return "hash"
-        elif self.serial_match(rom, meta):
-            return "serial"
-        elif self.name_match(rom, meta):
-            return "name"
-        return False
+            BaseRom.hash_members(pending)
+        if use_serial:
+            for rom in roms:
+                rom.get_serial()
+        return roms
+
+    def scan(self, use_hash=False, use_serial=False, workers=1, max_inflight=512 * 1024 * 1024, fast_crc=False):
+        """Hash and extract serials for all roms, optionally on a thread pool.
+
+        hashlib and zlib release the GIL on large buffers, so threads scale
+        across cores. ``max_inflight`` bounds the total on-disk size of roms
+        being processed at once, and results are collected in rom order.
+        With ``fast_crc``, archived roms are identified by the crc32 and size
+        stored in the archive directory and only fully hashed when that crc32
+        is ambiguous.
+        """
+        if fast_crc and self.matcher is None:
+            self.matcher = MatchIndex(self.metas)
+
+        groups = {}
+        for rom in self.roms.values():
+            key = rom.rom_path if rom.member is not None else id(rom)
+            groups.setdefault(key, []).append(rom)
 
-    def match(self, use_hash=False, use_serial=False):
-        if not self.roms or not self.metas:
+        if workers <= 1:
+            results = [self.scan_roms(roms, use_hash, use_serial, fast_crc) for roms in groups.values()]
+        else:
+            budget = ByteBudget(max_inflight)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = []
+                for roms in groups.values():
+                    reserved = budget.acquire(roms[0].file_size())
+                    future = pool.submit(self.scan_roms, roms, use_hash, use_serial, fast_crc)
+                    future.add_done_callback(lambda _, n=reserved: budget.release(n))
+                    futures.append(future)
+                results = [future.result() for future in futures]
+
+        # archives expanded during the scan are replaced by their members
+        if any(len(scanned) != len(roms) for scanned, roms in zip(results, groups.values())):
+            self.roms = {rom.name: rom for scanned in results for rom in scanned}
+
+        # the cache only keeps rows of files still under the scanned folders
+        if self.hash_cache is not None:
+            pruned = sum(self.hash_cache.prune(root) for root in self.roots)
+            if pruned:
+                print(f"Pruned {pruned} vanished files from the hash cache.")
+
+    def match(self, use_hash=False, use_serial=False, workers=1, fast_crc=False):
+        if not self.roms or (self.matcher is None and not self.metas):
             print("No roms or metadata added.")
             return
 
+        if self.matcher is None:
+            self.matcher = MatchIndex(self.metas)
+
+        self.scan(use_hash, use_serial, workers, fast_crc=fast_crc)
+
         success = 0
-        meta_names = [meta["name"] for meta in self.metas.values()]
-
-        for i, rom in enumerate(self.roms):
-            if use_hash:
-                self.roms[rom].get_hash()
-            if use_serial:
-                self.roms[rom].get_serial()
-
-            for meta in self.metas.values():
-                match_type = self.match_by_type(self.roms[rom], meta)
-                if match_type:
-                    _temp_meta = meta
-                    break
-            else:
-                match_type, name = self.fuzzy_match(self.roms[rom], meta_names)
-                if match_type:
-                    _temp_meta = self.metas[name]
+        results = self.matcher.match_many(list(self.roms.values()))
+        for i, (rom, (match_type, _temp_meta)) in enumerate(zip(self.roms, results)):
 
             if match_type:
                 self.roms[rom].meta = _temp_meta
@@ -131,6 +252,9 @@ class RomSet:
                 print(f"#{i+1} [Failed ] {rom} matche failed.")
 
         print(f"Matched {success} / {len(self.roms)} roms.")
+        self.matcher.report()
+        if self.hash_cache is not None:
+            self.hash_cache.report()
 
     def gen_rom_info(self, save_path):
         infos = []
@@ -178,10 +302,55 @@ class RomSet:
             else:
                 name = rom.name
             save_fp = os.path.join(out_path, name + "." + rom.extend)
-            shutil.copy(rom.rom_path, save_fp)
+            if rom.member is not None:
+                rom.extract(save_fp)
+            else:
+                shutil.copy(rom.rom_path, save_fp)
+
+    def cover_names(self, rom):
+        """Boxart names to try, in order: meta rom_name, meta name, then the rom file name."""
+        names = []
+        if rom.meta.get("rom_name"):
+            names.append(".".join(rom.meta["rom_name"].split(".")[:-1]))
+        names.extend([rom.meta["name"], rom.name])
+        return list(dict.fromkeys(names))
+
+    def fetch_cover(self, names, save_fp, limiter=None, index=None):
+        # with a media store, covers are fetched once and linked into every output folder
+        kwargs = {"limiter": limiter}
+        if self.media_store is not None:
+            kwargs["downloader"] = self.media_store.download
+
+        if index is not None:
+            # only names the thumbnail index knows to exist are requested, unless its listing was truncated
+            name = index.resolve(names)
+            if name is not None:
+                return bool(download_libretro_boxart(name, self.console_type, save_fp, **kwargs))
+            if "boxart" not in index.truncated:
+                return False
+
+        console = self.console_type.name
+        for name in names:
+            if self.miss_cache is not None and self.miss_cache.is_missing(console, name):
+                continue
+            res = download_libretro_boxart(name, self.console_type, save_fp, **kwargs)
+            if res:
+                return True
+            if res is False and self.miss_cache is not None:
+                self.miss_cache.add(console, name)
+        return False
+
+    def dl_images(self, out_path, use_std_name=False, use_alt_name=False, workers=1, rate=None, index=None):
+        """Download boxarts of matched roms, skipping covers already on disk.
 
-    def dl_images(self, out_path, use_std_name=False, use_alt_name=False):
+        ``workers`` covers are fetched at once, and ``rate`` caps the
+        requests per second sent to each host. With a ThumbnailIndex as
+        ``index``, names are resolved locally instead of guessed.
+        """
         os.makedirs(out_path, exist_ok=True)
+        # roms sharing a cover file are fetched once, trying every rom's names
+        tasks = {}
+        skipped = 0
         for rom in self.roms.values():
             if rom.meta is not None:
                 if use_std_name and rom.std_name is not None:
@@ -191,22 +360,52 @@ class RomSet:
                 else:
                     name = rom.name
                 save_fp = os.path.join(out_path, name + ".png")
-
-                rom_name = ".".join(rom.meta["rom_name"].split(".")[:-1])
-                if download_libretro_boxart(rom_name, self.console_type, save_fp):  # noqa: SIM114
-                    pass
-                elif download_libretro_boxart(rom.meta["name"], self.console_type, save_fp):  # noqa: SIM114
-                    pass
-                elif download_libretro_boxart(rom.name, self.console_type, save_fp):
-                    pass
+                if os.path.exists(save_fp):
+                    skipped += 1
+                else:
+                    tasks.setdefault(save_fp, []).extend(self.cover_names(rom))
+        print(f"{len(tasks)} covers to download, {skipped} skipped.")
+
+        limiter = HostRateLimiter(rate)
+        start = time.perf_counter()
+        success = total_bytes = 0
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            futures = {
+                pool.submit(self.fetch_cover, list(dict.fromkeys(names)), save_fp, limiter, index): save_fp
+                for save_fp, names in tasks.items()
+            }
+            for i, future in enumerate(as_completed(futures)):
+                save_fp = futures[future]
+                try:
+                    if future.result():
+                        success += 1
+                        total_bytes += os.path.getsize(save_fp)
+                except Exception as e:
+                    print(f"Error: cover {save_fp} failed: {e}")
+                cost = time.perf_counter() - start
+                print(
+                    f"#{i+1}/{len(tasks)} {success} downloaded, "
+                    f"{(i + 1) / cost:.1f} covers/s, {total_bytes / cost / 1024**2:.2f} MiB/s"
+                )
+        print(f"Downloaded {success} / {len(tasks)} covers in {time.perf_counter() - start:.1f} s.")
+        if self.miss_cache is not None:
+            self.miss_cache.prune()
+            self.miss_cache.report()
+        if self.media_store is not None:
+            self.media_store.report()
 
 
 class BaseRom:
-    def __init__(self, rom_path, ctype):
+    def __init__(self, rom_path, ctype, cache=None, member=None, entry=None):
         self.rom_path = rom_path
         self.ctype = ctype
-        self.name = ".".join(os.path.basename(rom_path).split(".")[:-1])
-        self.extend = os.path.basename(rom_path).split(".")[-1]
+        self.cache = cache
+        self.entry = entry  # RomEntry from the scanner, reused instead of stat calls
+        # a rom inside a multi-member archive is named after its member
+        self.member = member
+        base_name = os.path.basename(member or rom_path)
+        self.name = ".".join(base_name.split(".")[:-1])
+        self.extend = base_name.split(".")[-1]
 
         self.rom_name = self.name
         self.std_name = None
@@ -216,8 +415,12 @@ class BaseRom:
         self.sha1 = None
         self.md5 = None
         self.crc32 = None
+        self.size = None
         self.serial = None
+        self.header = None
         self.data = None
+        self.cached = None  # cache row, read at most once
+        self.expand_extensions = None  # set on archives whose members are listed on the first scan
 
         self.init()
 
@@ -227,31 +430,194 @@ class BaseRom:
     def __str__(self) -> str:
         return f"{self.ctype.name} Rom: {self.name}"
 
+    def get_filetype(self):
+        if self.filetype is None:
+            if fh.is_zip(self.rom_path):
+                self.filetype = RomDataType.ZIP
+            elif fh.is_rar(self.rom_path):
+                self.filetype = RomDataType.RAR
+            elif fh.is_7z(self.rom_path):
+                self.filetype = RomDataType._7Z
+            else:
+                self.filetype = RomDataType.BIN
+        return self.filetype
+
     def get_data(self):
-        if fh.is_zip(self.rom_path):
-            data = fh.load_zip(self.rom_path)
-        elif fh.is_rar(self.rom_path):
-            data = fh.load_rar(self.rom_path)
-        elif fh.is_7z(self.rom_path):
-            data = fh.load_7z(self.rom_path)
+        filetype = self.get_filetype()
+        if filetype == RomDataType.ZIP:
+            data = fh.load_zip(self.rom_path, self.member)
+        elif filetype == RomDataType.RAR:
+            data = fh.load_rar(self.rom_path, self.member)
+        elif filetype == RomDataType._7Z:
+            data = fh.load_7z(self.rom_path, self.member)
         else:
             data = fh.load_bin(self.rom_path)
         return data
 
+    def open_rom(self):
+        """Open the rom as a seekable file, or a null context for 7z members."""
+        filetype = self.get_filetype()
+        if filetype == RomDataType.ZIP:
+            return fh.open_zip(self.rom_path, self.member)
+        elif filetype == RomDataType.RAR:
+            return fh.open_rar(self.rom_path, self.member)
+        elif filetype == RomDataType._7Z:
+            return nullcontext()
+        return open(self.rom_path, "rb")
+
+    def extract(self, save_fp):
+        """Write the rom's own bytes (e.g. one archive member) to ``save_fp``."""
+        with open(save_fp, "wb") as out:
+            if self.get_filetype() == RomDataType._7Z:
+                fh.stream_7z(self.rom_path, out.write, self.member)
+                return
+            with self.open_rom() as f:
+                for chunk in fh.read_chunks(f):
+                    out.write(chunk)
+
+    def get_header(self, size=0x200):
+        """Read only the first ``size`` bytes of the rom, without loading the rest."""
+        if self.header is None or len(self.header) < size:
+            filetype = self.get_filetype()
+            if filetype == RomDataType.ZIP:
+                self.header = fh.head_zip(self.rom_path, size, self.member)
+            elif filetype == RomDataType.RAR:
+                self.header = fh.head_rar(self.rom_path, size, self.member)
+            elif filetype == RomDataType._7Z:
+                self.header = fh.head_7z(self.rom_path, size, self.member)
+            else:
+                self.header = fh.head_bin(self.rom_path, size)
+            self.header = self.header or b""
+        return self.header[:size]
+
+    def header_serial(self, start, end, header=None):
+        header = self.get_header(end) if header is None else header
+        try:
+            self.serial = header[start:end].decode("utf-8") if len(header) >= end else None
+        except UnicodeDecodeError:
+            self.serial = None
+        if self.serial is not None:
+            print(f"Serial for {self.name} is {self.serial}.")
+        else:
+            print(f"Serial for {self.name} not found.")
+
+    def file_size(self):
+        if self.entry is not None:
+            return self.entry.size
+        try:
+            return os.path.getsize(self.rom_path)
+        except OSError:
+            return 0
+
+    def identity(self):
+        if self.entry is None:
+            return None
+        return self.entry.size, self.entry.mtime_ns, self.entry.inode
+
+    def get_cached(self, field):
+        """Return the cached ``field`` of this rom (None when unknown), counting a hit or miss."""
+        if self.cache is None:
+            return None
+        if self.cached is None:
+            self.cached = self.cache.get(self.rom_path, self.member or "", self.identity()) or {}
+        value = self.cached.get(field)
+        self.cache.count(field, value is not None)
+        return value
+
+    def put_cached(self, **values):
+        if self.cache is not None:
+            self.cache.put(self.rom_path, self.member or "", self.identity(), **values)
+            if self.cached is not None:
+                self.cached.update((k, v) for k, v in values.items() if v is not None)
+
+    def get_crc(self):
+        """Fill crc32 and size from the archive directory without decompressing."""
+        if self.crc32 is None:
+            crc32 = self.get_cached("crc32")
+            if crc32 is not None:
+                self.crc32 = crc32
+                self.size = self.cached["size"]
+                return True
+
+            filetype = self.get_filetype()
+            if filetype == RomDataType.ZIP:
+                entry = fh.crc_zip(self.rom_path, self.member)
+            elif filetype == RomDataType.RAR:
+                entry = fh.crc_rar(self.rom_path, self.member)
+            elif filetype == RomDataType._7Z:
+                entry = fh.crc_7z(self.rom_path, self.member)
+            else:
+                entry = None
+            if entry is None:
+                return False
+            self.crc32, self.size = entry
+            self.put_cached(crc32=self.crc32, size=self.size)
+        return True
+
+    def load_cached_hash(self):
+        sha1 = self.get_cached("sha1")
+        if sha1 is not None:
+            self.crc32 = self.cached["crc32"]
+            self.md5 = self.cached["md5"]
+            self.sha1 = sha1
+            self.size = self.cached["size"]
+            return True
+        return False
+
     def get_hash(self):
-        if self.crc32 is None and self.md5 is None and self.sha1 is None:
+        if self.sha1 is None and not self.load_cached_hash():
             self.gen_hash()
 
+    @staticmethod
+    def hash_members(roms):
+        """Hash several members of one archive in a single pass over it."""
+        roms = [rom for rom in roms if rom.sha1 is None and not rom.load_cached_hash()]
+        if len(roms) <= 1 or any(rom.member is None for rom in roms):
+            for rom in roms:
+                rom.gen_hash()
+            return
+
+        filetype = roms[0].get_filetype()
+        members = [rom.member for rom in roms]
+        if filetype == RomDataType.ZIP:
+            hashers = fh.hash_zip_members(roms[0].rom_path, members)
+        elif filetype == RomDataType.RAR:
+            hashers = fh.hash_rar_members(roms[0].rom_path, members)
+        else:
+            hashers = fh.hash_7z_members(roms[0].rom_path, members)
+        for rom in roms:
+            rom.set_hash(hashers.get(rom.member))
+
+    def set_hash(self, hasher):
+        if hasher is None:
+            return
+        self.crc32 = hasher.crc32
+        self.md5 = hasher.md5
+        self.sha1 = hasher.sha1
+        self.size = hasher.size
+        self.put_cached(crc32=self.crc32, md5=self.md5, sha1=self.sha1, size=self.size)
+
     def gen_hash(self):
-        if self.data is None:
-            self.data = self.get_data()
-        self.crc32 = fh.calc_crc32(self.data)
-        self.md5 = fh.calc_md5(self.data)
-        self.sha1 = fh.calc_sha1(self.data)
+        filetype = self.get_filetype()
+        if filetype == RomDataType.ZIP:
+            hasher = fh.hash_zip(self.rom_path, self.member)
+        elif filetype == RomDataType.RAR:
+            hasher = fh.hash_rar(self.rom_path, self.member)
+        elif filetype == RomDataType._7Z:
+            hasher = fh.hash_7z(self.rom_path, self.member)
+        else:
+            hasher = fh.hash_bin(self.rom_path)
+        self.set_hash(hasher)
 
     def get_serial(self):
         if self.serial is None:
+            serial = self.get_cached("serial")
+            if serial is not None:
+                # a cached NO_SERIAL means the rom was already searched in vain
+                self.serial = serial if serial != NO_SERIAL else None
+                return
             self.gen_serial()
+            self.put_cached(serial=self.serial if self.serial is not None else NO_SERIAL)
 
     def gen_serial(self):
         pass
@@ -262,46 +628,65 @@ class BaseRom:
 
 class GBC(BaseRom):
     def init(self):
-        self.compatibility()
+        self._compatibility = None
 
     def gen_serial(self):
-        if self.data is None:
-            self.data = self.get_data()
-        try:
-            self.serial = self.data[0x013F:0x0143].decode("utf-8")
-            print(f"Serial for {self.name} is {self.serial}.")
-        except UnicodeDecodeError:
-            self.serial = None
-            print(f"Serial for {self.name} not found.")
+        self.header_serial(0x013F, 0x0143)
 
     def compatibility(self):
-        data = self.get_data()
-        if data[0x0143] == 0xC0:
-            self.is_gb = False
-            self.is_gbc = True
-        elif data[0x0143] == 0x80:
-            self.is_gb = True
-            self.is_gbc = True
-        else:
-            self.is_gb = True
-            self.is_gbc = False
-        self.is_sgb = data[0x0146] == 0x03
+        """Read (is_gb, is_gbc, is_sgb) from the header on first access."""
+        if self._compatibility is None:
+            header = self.get_header(0x0150)
+            if len(header) < 0x0147:
+                self._compatibility = (True, False, False)
+            elif header[0x0143] == 0xC0:
+                self._compatibility = (False, True, header[0x0146] == 0x03)
+            elif header[0x0143] == 0x80:
+                self._compatibility = (True, True, header[0x0146] == 0x03)
+            else:
+                self._compatibility = (True, False, header[0x0146] == 0x03)
+        return self._compatibility
+
+    @property
+    def is_gb(self):
+        return self.compatibility()[0]
+
+    @property
+    def is_gbc(self):
+        return self.compatibility()[1]
+
+    @property
+    def is_sgb(self):
+        return self.compatibility()[2]
+
+
+class GB(GBC):
+    def gen_serial(self):
+        # only CGB-aware carts carry a manufacturer code; DMG title bytes are no serial
+        if self.is_gbc:
+            super().gen_serial()
 
 
 class GBA(BaseRom):
     def gen_serial(self):
-        if self.data is None:
-            self.data = self.get_data()
-        try:
+        self.header_serial(0xAC, 0xB0)
 
-            self.serial = self.data[0xAC:0xB0].decode("utf-8")
-            print(f"Serial for {self.name} is {self.serial}.")
-        except UnicodeDecodeError:
-            self.serial = None
-            print(f"Serial for {self.name} not found.")
+
+class NDS(BaseRom):
+    def gen_serial(self):
+        self.header_serial(0x0C, 0x10)
 
 
 class N64(BaseRom):
+    def gen_serial(self):
+        header = self.get_header(0x40)
+        rom_format = N64ByteSwapper.rom_formats_map.get(header[:4])
+        if rom_format == "n64":
+            header = N64ByteSwapper.reverse_bytes(header)
+        elif rom_format == "v64":
+            header = bytes(N64ByteSwapper.swap_bytes(header))
+        self.header_serial(0x3B, 0x3F, header)
+
     def to_z64(self, rom_path: str, rom_type: str):
         base, file = os.path.split(rom_path)
         file, _ = os.path.splitext(file)
@@ -310,22 +695,57 @@ class N64(BaseRom):
         n64bs.save("z64", output_path)
 
 
+class GC(BaseRom):
+    def gen_serial(self):
+        self.header_serial(0x00, 0x04)
+
+
+PS_7Z_HEAD_SIZE = 8 * 1024 * 1024  # SYSTEM.CNF / PARAM.SFO sit in the first few MiB of a disc
+
+
 class PS(BaseRom):
     def gen_serial(self):
-        if self.data is None:
-            self.data = self.get_data()
-
-        regexp = b"[A-Z]{4}[_-][0-9]{3}[.][0-9]{2}|LSP[0-9]{5}[.][0-9]{3}"
-        serial = re.search(regexp, self.data)
-        if serial:
-            serial = serial.group(0).decode("utf-8")
-            serial = serial.replace("_", "").replace(".", "").replace("-", "")
-            serial = serial[:4] + "-" + serial[4:]
-            self.serial = serial
+        if self.get_filetype() == RomDataType._7Z:
+            # 7z members are not seekable, so the filesystem is read from the first sectors only
+            self.serial = disc_serial(io.BytesIO(fh.head_7z(self.rom_path, PS_7Z_HEAD_SIZE, self.member) or b""))
+        else:
+            with self.open_rom() as f:
+                self.serial = disc_serial(f) if f is not None else None
+        if self.serial is None:
+            self.serial = self.scan_serial()
+
+        if self.serial is not None:
             print(f"Serial for {self.name} is {self.serial}.")
         else:
             print(f"Serial for {self.name} not found.")
 
+    def scan_serial(self):
+        """Fallback: regexp search over the first 64 MiB, one chunk at a time."""
+        search = WindowedSearch()
+        if self.get_filetype() == RomDataType._7Z:
+
+            def sink(chunk):
+                if search.feed(chunk):
+                    raise fh.HeadReached
+
+            with suppress(fh.HeadReached):
+                fh.stream_7z(self.rom_path, sink, self.member)
+        else:
+            with self.open_rom() as f:
+                if f is not None:
+                    for chunk in fh.read_chunks(f):
+                        if search.feed(chunk):
+                            break
+        return search.result
+
+
+class PS2(PS):
+    pass
+
+
+class PSP(PS):
+    pass
+
 
 class ARCADE(BaseRom):
     pass
@@ -0,0 +1,116 @@
+import os
+import json
+import time
+
+from .match import FuzzyIndex, normalize_name
+from ..utils.cache import default_cache_dir
+from ..utils.spider import TIMEOUT, clean_name, clean_str, get_session
+from ..utils.constants import INVERT_RDB_CONSOLE_MAP
+
+THUMBNAIL_KINDS = {"boxart": "Named_Boxarts", "snap": "Named_Snaps", "title": "Named_Titles"}
+TREE_URL = "https://api.github.com/repos/libretro-thumbnails/{}/git/trees/{}"
+
+
+class ThumbnailIndex:
+    """Local index of the thumbnails a libretro-thumbnails console provides.
+
+    The file lists are fetched once, from the GitHub tree API (or any
+    server answering ``source`` with the same JSON) or from a local
+    checkout directory, and cached as JSON for ``ttl`` seconds. Rom names
+    then resolve to existing files without a request: exact names first,
+    then tag-stripped names, then fuzzy matches. A folder the tree API
+    truncated is listed in ``truncated``; names missing from it are not
+    proof that no thumbnail exists.
+    """
+
+    def __init__(self, console_type, source=TREE_URL, cache_dir=None, ttl=7 * 24 * 3600, cutoff=95):
+        self.console = clean_str(INVERT_RDB_CONSOLE_MAP[console_type])
+        self.source = source
+        self.cache_dir = cache_dir or os.path.join(default_cache_dir(), "thumbnails")
+        self.ttl = ttl
+        self.cutoff = cutoff
+        self.truncated = set()
+
+        self.files = self.load()
+        self.exact = {kind: set(names) for kind, names in self.files.items()}
+        self.normalized = {}
+        for kind, names in self.files.items():
+            table = self.normalized[kind] = {}
+            for name in names:
+                table.setdefault(normalize_name(name), name)
+        self.fuzzy = {}
+
+    def cache_path(self):
+        return os.path.join(self.cache_dir, f"{self.console}.json")
+
+    def load(self):
+        cache_fp = self.cache_path()
+        try:
+            with open(cache_fp) as f:
+                cached = json.load(f)
+            if cached["source"] == self.source and cached["fetched_at"] + self.ttl > time.time():
+                self.truncated = set(cached.get("truncated", []))
+                return cached["files"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        files = self.fetch()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_fp = f"{cache_fp}.{os.getpid()}.tmp"
+        with open(tmp_fp, "w") as f:
+            cached = {
+                "source": self.source,
+                "fetched_at": time.time(),
+                "files": files,
+                "truncated": sorted(self.truncated),
+            }
+            json.dump(cached, f)
+        os.replace(tmp_fp, cache_fp)
+        return files
+
+    def fetch(self):
+        """Return ``{kind: [file name without .png]}``, recording truncated folders in ``truncated``."""
+        if os.path.isdir(self.source):
+            root = os.path.join(self.source, self.console)
+            listing = {}
+            for kind, folder in THUMBNAIL_KINDS.items():
+                path = os.path.join(root, folder)
+                listing[kind] = sorted(os.listdir(path)) if os.path.isdir(path) else []
+        else:
+            root = {e["path"]: e["sha"] for e in self.tree("master") if e["type"] == "tree"}
+            listing = {}
+            for kind, folder in THUMBNAIL_KINDS.items():
+                entries = self.tree(root[folder], kind) if folder in root else []
+                listing[kind] = [e["path"] for e in entries if e["type"] == "blob"]
+        return {kind: [n[:-4] for n in names if n.lower().endswith(".png")] for kind, names in listing.items()}
+
+    def tree(self, sha, kind=None):
+        url = self.source.format(self.console, sha)
+        response = get_session(url).get(url, timeout=TIMEOUT)
+        response.raise_for_status()
+        tree = response.json()
+        if tree.get("truncated"):
+            # the tree API cannot be paged; such a folder only helps as a hint
+            print(f"Warning: {self.console} {kind or sha} listing is truncated, unlisted names are guessed.")
+            if kind is not None:
+                self.truncated.add(kind)
+        return tree["tree"]
+
+    def resolve(self, names, kind="boxart"):
+        """Return the first existing thumbnail name for ``names`` (in priority order), or None."""
+        names = [n for n in names if n]
+        for name in names:
+            # libretro stores names with /\|<>:?*& replaced by _
+            if clean_name(name) in self.exact[kind]:
+                return clean_name(name)
+        for name in names:
+            found = self.normalized[kind].get(normalize_name(name))
+            if found is not None:
+                return found
+        if kind not in self.fuzzy:
+            self.fuzzy[kind] = FuzzyIndex(self.files[kind], cutoff=self.cutoff)
+        for name in names:
+            found, _ = self.fuzzy[kind].extract(name)
+            if found is not None:
+                return found
+        return None
@@ -0,0 +1,192 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import Counter
+
+# stored as a serial once a rom was scanned and none was found
+NO_SERIAL = ""
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "rommer")
+
+
+def open_db(db_fp, name):
+    """Return ``(db_fp, conn)`` for a cache database shared across threads.
+
+    ``db_fp`` defaults to ``name`` in the default cache dir; the connection
+    runs in WAL mode with synchronous=NORMAL.
+    """
+    if db_fp is None:
+        db_fp = os.path.join(default_cache_dir(), name)
+    os.makedirs(os.path.dirname(os.path.abspath(db_fp)), exist_ok=True)
+    conn = sqlite3.connect(db_fp, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return db_fp, conn
+
+
+def file_identity(fp):
+    st = os.stat(fp)
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+class HashCache:
+    """Persistent SQLite cache of rom digests and serials.
+
+    Rows are keyed by (path, member) and only returned while the file's
+    (size, mtime_ns, inode) still match what was recorded. Hits and misses
+    are counted per field by the caller through ``count``, so a row
+    missing the requested digest shows up as a miss.
+    """
+
+    FIELDS = ["crc32", "md5", "sha1", "size", "serial"]
+
+    def __init__(self, db_fp=None):
+        self.db_fp, self.conn = open_db(db_fp, "hash.sqlite")
+        self.hits = Counter()
+        self.misses = Counter()
+        self.lock = threading.Lock()
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS hashes (
+                path TEXT NOT NULL,
+                member TEXT NOT NULL DEFAULT '',
+                file_size INTEGER,
+                mtime_ns INTEGER,
+                inode INTEGER,
+                crc32 TEXT,
+                md5 TEXT,
+                sha1 TEXT,
+                size INTEGER,
+                serial TEXT,
+                PRIMARY KEY (path, member)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, path, member="", identity=None):
+        """Return cached fields for a rom, or None when missing or stale."""
+        path = os.path.abspath(path)
+        try:
+            identity = identity or file_identity(path)
+        except OSError:
+            return None
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT file_size, mtime_ns, inode, {', '.join(self.FIELDS)} FROM hashes "
+                "WHERE path = ? AND member = ?",
+                (path, member),
+            ).fetchone()
+        if row is None or tuple(row[:3]) != tuple(identity):
+            return None
+        return dict(zip(self.FIELDS, row[3:]))
+
+    def count(self, field, hit):
+        with self.lock:
+            (self.hits if hit else self.misses)[field] += 1
+
+    def put(self, path, member="", identity=None, **values):
+        """Store fields for a rom, dropping values cached for an older file version."""
+        path = os.path.abspath(path)
+        values = {k: v for k, v in values.items() if k in self.FIELDS and v is not None}
+        try:
+            identity = identity or file_identity(path)
+        except OSError:
+            return
+        with self.lock:
+            self.conn.execute(
+                "DELETE FROM hashes WHERE path = ? AND member = ? AND (file_size, mtime_ns, inode) IS NOT (?, ?, ?)",
+                (path, member, *identity),
+            )
+            self.conn.execute(
+                "INSERT OR IGNORE INTO hashes (path, member, file_size, mtime_ns, inode) VALUES (?, ?, ?, ?, ?)",
+                (path, member, *identity),
+            )
+            if values:
+                columns = ", ".join(f"{k} = ?" for k in values)
+                self.conn.execute(
+                    f"UPDATE hashes SET {columns} WHERE path = ? AND member = ?",
+                    (*values.values(), path, member),
+                )
+            self.conn.commit()
+
+    def prune(self, root=None):
+        """Delete rows whose file vanished, optionally only under ``root``."""
+        with self.lock:
+            paths = [p for (p,) in self.conn.execute("SELECT DISTINCT path FROM hashes")]
+            if root is not None:
+                root = os.path.join(os.path.abspath(root), "")
+                paths = [p for p in paths if p.startswith(root)]
+            vanished = [(p,) for p in paths if not os.path.exists(p)]
+            self.conn.executemany("DELETE FROM hashes WHERE path = ?", vanished)
+            self.conn.commit()
+        return len(vanished)
+
+    def report(self):
+        fields = [f for f in self.FIELDS if self.hits[f] or self.misses[f]]
+        counts = ", ".join(f"{f} {self.hits[f]} hits / {self.misses[f]} misses" for f in fields)
+        print(f"Hash cache: {counts or 'unused'}.")
+
+    def close(self):
+        self.conn.close()
+
+
+class MissCache:
+    """Persistent SQLite record of media known to be missing upstream.
+
+    A (kind, console, name) miss is trusted for ``ttl`` seconds, then the
+    name is tried again.
+    """
+
+    def __init__(self, db_fp=None, ttl=7 * 24 * 3600):
+        self.db_fp, self.conn = open_db(db_fp, "misses.sqlite")
+        self.ttl = ttl
+        self.hits = 0
+        self.lock = threading.Lock()
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS misses (
+                kind TEXT NOT NULL,
+                console TEXT NOT NULL,
+                name TEXT NOT NULL,
+                checked_at REAL,
+                PRIMARY KEY (kind, console, name)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def is_missing(self, console, name, kind="boxart"):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT checked_at FROM misses WHERE kind = ? AND console = ? AND name = ?", (kind, console, name)
+            ).fetchone()
+            if row is None or row[0] + self.ttl < time.time():
+                return False
+            self.hits += 1
+        return True
+
+    def add(self, console, name, kind="boxart"):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO misses (kind, console, name, checked_at) VALUES (?, ?, ?, ?)",
+                (kind, console, name, time.time()),
+            )
+            self.conn.commit()
+
+    def prune(self):
+        """Delete expired misses."""
+        with self.lock:
+            cur = self.conn.execute("DELETE FROM misses WHERE checked_at + ? < ?", (self.ttl, time.time()))
+            self.conn.commit()
+        return cur.rowcount
+
+    def report(self):
+        print(f"Miss cache: {self.hits} known misses skipped.")
+
+    def close(self):
+        self.conn.close()
@@ -1,9 +1,14 @@
 import zlib
 import hashlib
 import zipfile
+from contextlib import contextmanager
 
 import py7zr
 import rarfile
+from py7zr.io import Py7zIO, WriterFactory
+
+CHUNK_SIZE = 1024 * 1024
+ARCHIVE_EXTENSIONS = ["zip", "rar", "7z"]
 
 
 def is_zip(fp):
@@ -42,36 +47,51 @@ def is_cue(fp):
     pass
 
 
-def load_zip(fp):
+def list_zip(fp):
     with zipfile.ZipFile(fp, "r") as z:
-        file_list = z.namelist()
-        if not file_list:
+        return filter_mac_files([i.filename for i in z.infolist() if not i.is_dir()])
+
+
+def list_rar(fp):
+    with rarfile.RarFile(fp, "r") as r:
+        return filter_mac_files([i.filename for i in r.infolist() if not i.is_dir()])
+
+
+def list_7z(fp):
+    with py7zr.SevenZipFile(fp, "r") as z:
+        return filter_mac_files([i.filename for i in z.list() if not i.is_directory])
+
+
+def first_member(file_list):
+    file_list = filter_mac_files(file_list)
+    return file_list[0] if file_list else None
+
+
+def load_zip(fp, member=None):
+    with zipfile.ZipFile(fp, "r") as z:
+        file = member or first_member(z.namelist())
+        if file is None:
             return None
-        file = file_list[0]
         with z.open(file) as f:
             content = f.read()
         return content
 
 
-def load_rar(fp):
+def load_rar(fp, member=None):
     with rarfile.RarFile(fp, "r") as r:
-        file_list = r.namelist()
-        if not file_list:
+        file = member or first_member(r.namelist())
+        if file is None:
             return None
-        file = file_list[0]
         with r.open(file) as f:
             content = f.read()
         return content
 
 
-def load_7z(fp):
-    with py7zr.SevenZipFile(fp, "r") as z:
-        file_list = z.getnames()
-        if not file_list:
-            return None
-        file = file_list[0]
-        content = z.read()[file].read()
-        return content
+def load_7z(fp, member=None):
+    chunks = []
+    if not stream_7z(fp, chunks.append, member):
+        return None
+    return b"".join(chunks)
 
 
 def load_bin(fp):
@@ -91,6 +111,244 @@ def calc_crc32(data):
     return f"{zlib.crc32(data)  & 0xFFFFFFFF:08X}"
 
 
+class MultiHash:
+    """Feed each chunk to crc32, md5 and sha1 in a single pass."""
+
+    def __init__(self):
+        self.crc = 0
+        self.size = 0
+        self._md5 = hashlib.md5()
+        self._sha1 = hashlib.sha1()
+
+    def update(self, chunk):
+        self.crc = zlib.crc32(chunk, self.crc)
+        self._md5.update(chunk)
+        self._sha1.update(chunk)
+        self.size += len(chunk)
+
+    @property
+    def crc32(self):
+        return f"{self.crc & 0xFFFFFFFF:08X}"
+
+    @property
+    def md5(self):
+        return self._md5.hexdigest().upper()
+
+    @property
+    def sha1(self):
+        return self._sha1.hexdigest().upper()
+
+
+class SinkIO(Py7zIO):
+    """py7zr writer passing every decompressed chunk to a callback."""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self._size = 0
+
+    def write(self, s):
+        self.sink(bytes(s))
+        self._size += len(s)
+        return len(s)
+
+    def read(self, size=None):
+        return b""
+
+    def seek(self, offset, whence=0):
+        return 0
+
+    def flush(self):
+        pass
+
+    def size(self):
+        return self._size
+
+
+class SinkFactory(WriterFactory):
+    """Create a SinkIO per member, with ``get_sink(filename)`` choosing the callback."""
+
+    def __init__(self, get_sink):
+        self.get_sink = get_sink
+
+    def create(self, filename):
+        return SinkIO(self.get_sink(filename))
+
+
+def read_chunks(f, chunk_size=CHUNK_SIZE):
+    return iter(lambda: f.read(chunk_size), b"")
+
+
+def hash_zip_members(fp, members):
+    """Hash several zip members in one open of the archive."""
+    hashers = {}
+    with zipfile.ZipFile(fp, "r") as z:
+        for member in members:
+            hasher = hashers[member] = MultiHash()
+            with z.open(member) as f:
+                for chunk in read_chunks(f):
+                    hasher.update(chunk)
+    return hashers
+
+
+def hash_rar_members(fp, members):
+    """Hash several rar members, in archive order so solid archives are read once."""
+    hashers = {}
+    with rarfile.RarFile(fp, "r") as r:
+        for member in [name for name in r.namelist() if name in members]:
+            hasher = hashers[member] = MultiHash()
+            with r.open(member) as f:
+                for chunk in read_chunks(f):
+                    hasher.update(chunk)
+    return hashers
+
+
+def hash_7z_members(fp, members):
+    """Hash several 7z members in a single decompression pass."""
+    hashers = {member: MultiHash() for member in members}
+    with py7zr.SevenZipFile(fp, "r") as z:
+        z.extract(targets=list(members), factory=SinkFactory(lambda name: hashers[name].update))
+    return hashers
+
+
+def hash_zip(fp, member=None):
+    with zipfile.ZipFile(fp, "r") as z:
+        member = member or first_member(z.namelist())
+    if member is None:
+        return None
+    return hash_zip_members(fp, [member])[member]
+
+
+def hash_rar(fp, member=None):
+    with rarfile.RarFile(fp, "r") as r:
+        member = member or first_member(r.namelist())
+    if member is None:
+        return None
+    return hash_rar_members(fp, [member])[member]
+
+
+def hash_7z(fp, member=None):
+    hasher = MultiHash()
+    if not stream_7z(fp, hasher.update, member):
+        return None
+    return hasher
+
+
+def hash_bin(fp):
+    hasher = MultiHash()
+    with open(fp, "rb") as f:
+        for chunk in read_chunks(f):
+            hasher.update(chunk)
+    return hasher
+
+
+def file_sha1(fp):
+    """Lowercase hex sha1 of a whole file, read in chunks."""
+    sha1 = hashlib.sha1()
+    with open(fp, "rb") as f:
+        for chunk in read_chunks(f):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def stream_7z(fp, sink, member=None):
+    """Pass one member of a 7z archive to ``sink`` chunk by chunk."""
+    with py7zr.SevenZipFile(fp, "r") as z:
+        member = member or first_member(z.getnames())
+        if member is None:
+            return False
+        z.extract(targets=[member], factory=SinkFactory(lambda _: sink))
+    return True
+
+
+@contextmanager
+def open_zip(fp, member=None):
+    with zipfile.ZipFile(fp, "r") as z:
+        file = member or first_member(z.namelist())
+        if file is None:
+            yield None
+            return
+        with z.open(file) as f:
+            yield f
+
+
+@contextmanager
+def open_rar(fp, member=None):
+    with rarfile.RarFile(fp, "r") as r:
+        file = member or first_member(r.namelist())
+        if file is None:
+            yield None
+            return
+        with r.open(file) as f:
+            yield f
+
+
+def crc_zip(fp, member=None):
+    """Read crc32 and size of a member from the zip central directory."""
+    with zipfile.ZipFile(fp, "r") as z:
+        file = member or first_member(z.namelist())
+        if file is None:
+            return None
+        info = z.getinfo(file)
+        return f"{info.CRC:08X}", info.file_size
+
+
+def crc_rar(fp, member=None):
+    with rarfile.RarFile(fp, "r") as r:
+        file = member or first_member(r.namelist())
+        if file is None:
+            return None
+        info = r.getinfo(file)
+        if info.CRC is None:
+            return None
+        return f"{info.CRC & 0xFFFFFFFF:08X}", info.file_size
+
+
+def crc_7z(fp, member=None):
+    with py7zr.SevenZipFile(fp, "r") as z:
+        file = member or first_member(z.getnames())
+        for info in z.list():
+            if info.filename == file:
+                if info.crc32 is None:
+                    return None
+                return f"{info.crc32 & 0xFFFFFFFF:08X}", info.uncompressed
+    return None
+
+
+class HeadReached(Exception):
+    pass
+
+
+def head_zip(fp, size, member=None):
+    with open_zip(fp, member) as f:
+        return f.read(size) if f is not None else None
+
+
+def head_rar(fp, size, member=None):
+    with open_rar(fp, member) as f:
+        return f.read(size) if f is not None else None
+
+
+def head_7z(fp, size, member=None):
+    head = bytearray()
+
+    def sink(chunk):
+        head.extend(chunk)
+        if len(head) >= size:
+            raise HeadReached
+
+    try:
+        if not stream_7z(fp, sink, member):
+            return None
+    except HeadReached:
+        pass
+    return bytes(head[:size])
+
+
+def head_bin(fp, size):
+    with open(fp, "rb") as f:
+        return f.read(size)
+
+
 def filter_mac_files(files):
     return [file for file in files if "__MACOSX" not in file]
 
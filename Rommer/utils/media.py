@@ -0,0 +1,174 @@
+import os
+import time
+import shutil
+import hashlib
+import threading
+from concurrent.futures import Future
+
+from .file import file_sha1
+from .cache import default_cache_dir, open_db
+from .spider import download_bin_file
+
+FICLONE = 0x40049409  # linux ioctl cloning a whole file on btrfs/xfs
+LINK_MODES = ["hardlink", "reflink", "symlink", "copy"]
+
+
+def reflink(src, dst):
+    import fcntl
+
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+LINKERS = {
+    "hardlink": os.link,
+    "reflink": reflink,
+    "symlink": lambda src, dst: os.symlink(os.path.abspath(src), dst),
+    "copy": shutil.copyfile,
+}
+
+
+def link_file(src, dst, modes=LINK_MODES):
+    """Place ``src`` at ``dst`` with the first link mode that works; return the mode used.
+
+    A ``dst`` already pointing at ``src`` is left untouched.
+    """
+    try:
+        if os.path.samefile(src, dst):
+            return "same"
+    except OSError:
+        pass
+    tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.link"
+    error = None
+    for mode in modes:
+        try:
+            LINKERS[mode](src, tmp)
+            os.replace(tmp, dst)
+            return mode
+        except (OSError, ImportError) as e:
+            error = e
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+    raise OSError(f"Could not link {src} to {dst}: {error}")
+
+
+class MediaStore:
+    """Content-addressed store of downloaded media.
+
+    Each file lives once under ``objects/`` named by its sha1, and an
+    SQLite table maps source URLs to those hashes. Output directories are
+    filled with links into the store (hardlink, reflink, symlink, then
+    copy), so exporting the same art again needs no network and no data
+    writes. Concurrent fetches of one URL share a single download.
+    """
+
+    def __init__(self, root=None, modes=LINK_MODES):
+        self.root = root or os.path.join(default_cache_dir(), "media")
+        self.modes = modes
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "tmp"), exist_ok=True)
+
+        self.hits = 0
+        self.fetched = 0
+        self.links = {}
+        self.inflight = {}
+        self.lock = threading.Lock()
+        _, self.conn = open_db(os.path.join(self.root, "urls.sqlite"), "urls.sqlite")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                sha1 TEXT NOT NULL,
+                size INTEGER,
+                fetched_at REAL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def object_path(self, sha1, ext=""):
+        return os.path.join(self.root, "objects", sha1[:2], sha1 + ext)
+
+    def lookup(self, url):
+        """Return the stored object of ``url``, or None when unknown or gone."""
+        with self.lock:
+            row = self.conn.execute("SELECT sha1 FROM urls WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        fp = self.object_path(row[0], os.path.splitext(url)[1])
+        return fp if os.path.exists(fp) else None
+
+    def fetch(self, url, **kwargs):
+        """Return the object path of ``url``, downloading it only when not stored yet.
+
+        On failure returns download_bin_file's result (False for missing, None otherwise).
+        """
+        fp = self.lookup(url)
+        if fp is not None:
+            with self.lock:
+                self.hits += 1
+            return fp
+
+        with self.lock:
+            future = self.inflight.get(url)
+            owner = future is None
+            if owner:
+                future = self.inflight[url] = Future()
+        if not owner:
+            # another thread is downloading it; its result is this one's
+            res = future.result()
+            if res:
+                with self.lock:
+                    self.hits += 1
+            return res
+        try:
+            # a download finishing between the lookup above and taking ownership is not repeated
+            res = self.lookup(url) or self.download_object(url, **kwargs)
+            future.set_result(res)
+            return res
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[url]
+
+    def download_object(self, url, **kwargs):
+        # named after the url so an interrupted download resumes from its .part
+        tmp = os.path.join(self.root, "tmp", hashlib.sha1(url.encode()).hexdigest())
+        res = download_bin_file(url, tmp, **kwargs)
+        if not res:
+            return res
+        sha1 = file_sha1(tmp)
+        fp = self.object_path(sha1, os.path.splitext(url)[1])
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        if os.path.exists(fp):
+            os.remove(tmp)
+        else:
+            os.replace(tmp, fp)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO urls (url, sha1, size, fetched_at) VALUES (?, ?, ?, ?)",
+                (url, sha1, os.path.getsize(fp), time.time()),
+            )
+            self.conn.commit()
+            self.fetched += 1
+        return fp
+
+    def download(self, url, save_path, **kwargs):
+        """Drop-in for download_bin_file: fetch through the store, then link into ``save_path``."""
+        fp = self.fetch(url, **kwargs)
+        if not fp:
+            return fp
+        os.makedirs(os.path.dirname(os.path.abspath(save_path)), exist_ok=True)
+        mode = link_file(fp, save_path, self.modes)
+        with self.lock:
+            self.links[mode] = self.links.get(mode, 0) + 1
+        return True
+
+    def report(self):
+        links = ", ".join(f"{n} {mode}" for mode, n in self.links.items()) or "none"
+        print(f"Media store: {self.hits} cached, {self.fetched} downloaded, links: {links}.")
+
+    def close(self):
+        self.conn.close()
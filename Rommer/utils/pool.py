@@ -0,0 +1,46 @@
+import time
+import threading
+from urllib.parse import urlsplit
+
+
+class ByteBudget:
+    """Bound the number of bytes held by in-flight tasks."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.cond = threading.Condition()
+
+    def acquire(self, size):
+        """Block until ``size`` bytes fit, return the amount actually reserved."""
+        size = min(max(size, 1), self.max_bytes)
+        with self.cond:
+            while self.used + size > self.max_bytes:
+                self.cond.wait()
+            self.used += size
+        return size
+
+    def release(self, size):
+        with self.cond:
+            self.used -= size
+            self.cond.notify_all()
+
+
+class HostRateLimiter:
+    """Space out requests to each host to at most ``rate`` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
@@ -0,0 +1,92 @@
+import os
+import threading
+from fnmatch import fnmatch
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+RomEntry = namedtuple("RomEntry", ["path", "size", "mtime_ns", "inode", "extension"])
+
+
+def get_extension(name):
+    return name.rsplit(".", 1)[-1].lower() if "." in name else ""
+
+
+def match_any(path, patterns):
+    return any(fnmatch(path, p) or fnmatch(os.path.basename(path), p) for p in patterns)
+
+
+class Scanner:
+    """Lazy ``os.scandir`` walker yielding RomEntry descriptors.
+
+    Stat results come from the cached DirEntry, subdirectories can be
+    listed on a thread pool, and ``max_listing`` caps concurrent directory
+    listings so network filesystems are not flooded. Like ``os.walk``,
+    symlinked directories are not followed, and entries come out in the
+    same depth-first order whatever the number of workers.
+    """
+
+    def __init__(self, root, valid_extensions=None, include=None, exclude=None, workers=1, max_listing=4):
+        self.root = root
+        self.valid_extensions = {e.lower() for e in valid_extensions} if valid_extensions else None
+        self.include = [include] if isinstance(include, str) else include
+        self.exclude = [exclude] if isinstance(exclude, str) else exclude
+        self.workers = workers
+        self.listing = threading.BoundedSemaphore(max_listing)
+
+    def relpath(self, path):
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def accept(self, entry):
+        ext = get_extension(entry.name)
+        if self.valid_extensions is not None and ext not in self.valid_extensions:
+            return False
+        rel = self.relpath(entry.path)
+        if self.include and not match_any(rel, self.include):
+            return False
+        return not (self.exclude and match_any(rel, self.exclude))
+
+    def list_dir(self, path):
+        files, dirs = [], []
+        with self.listing:
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if not (self.exclude and match_any(self.relpath(entry.path), self.exclude)):
+                                    dirs.append(entry.path)
+                            elif entry.is_file() and self.accept(entry):
+                                st = entry.stat()
+                                files.append(
+                                    RomEntry(
+                                        entry.path, st.st_size, st.st_mtime_ns, st.st_ino, get_extension(entry.name)
+                                    )
+                                )
+                        except OSError as e:
+                            print(f"Error: {e}")
+            except OSError as e:
+                print(f"Error: {e}")
+        files.sort()
+        dirs.sort()
+        return files, dirs
+
+    def __iter__(self):
+        if self.workers <= 1:
+            stack = [self.root]
+            while stack:
+                files, dirs = self.list_dir(stack.pop())
+                yield from files
+                stack.extend(reversed(dirs))
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            # sibling listings run ahead on the pool, but are consumed in depth-first order
+            stack = [pool.submit(self.list_dir, self.root)]
+            while stack:
+                files, dirs = stack.pop().result()
+                yield from files
+                stack.extend(reversed([pool.submit(self.list_dir, d) for d in dirs]))
+
+
+def scan_roms(root, valid_extensions=None, include=None, exclude=None, workers=1, max_listing=4):
+    return iter(Scanner(root, valid_extensions, include, exclude, workers, max_listing))
@@ -1,26 +1,150 @@
 import os
-import shutil
+import time
+import random
+import threading
 from functools import partial
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote, urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from .file import extract_zip
 from .constants import INVERT_RDB_CONSOLE_MAP
 
+TIMEOUT = (10, 60)  # connect, read
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+POOL_SIZE = 16
+BACKOFF = 1.0  # seconds, doubled per retry
+MAX_RETRY_AFTER = 120  # seconds, upper bound on a server's Retry-After
+MISSING_STATUS = {404, 410}
+TRANSIENT_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
 
-def download_bin_file(url, save_path):
+sessions = {}
+sessions_lock = threading.Lock()
+
+
+def get_session(url):
+    """Shared keep-alive session per host, so repeated fetches reuse connections."""
+    host = urlsplit(url).netloc
+    with sessions_lock:
+        session = sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            sessions[host] = session
+    return session
+
+
+def is_transient(error):
+    """Timeouts, dropped connections, 429 and 5xx are worth retrying; other HTTP errors are final."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return isinstance(error, TRANSIENT_ERRORS)
+    return response.status_code == 429 or response.status_code >= 500
+
+
+def retry_delay(error, attempt, backoff=BACKOFF):
+    """Honour a Retry-After (seconds or HTTP-date) up to MAX_RETRY_AFTER, else exponential backoff with full jitter."""
+    response = getattr(error, "response", None)
+    delay = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+    if delay is not None:
+        return min(delay, MAX_RETRY_AFTER)
+    return random.uniform(0, backoff * 2**attempt)
+
+
+def parse_retry_after(value):
+    """Seconds to wait for a Retry-After header value, or None when missing or malformed."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def read_validator(validator_fp):
+    try:
+        with open(validator_fp) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def write_validator(validator_fp, response):
+    """Keep the ETag (or Last-Modified) of a fresh download, for If-Range on resume."""
+    validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+    if validator and not validator.startswith("W/"):  # If-Range needs a strong validator
+        with open(validator_fp, "w") as f:
+            f.write(validator)
+    elif os.path.exists(validator_fp):
+        os.remove(validator_fp)
+
+
+def download_bin_file(url, save_path, retries=3, timeout=TIMEOUT, limiter=None, backoff=BACKOFF):
+    """Stream ``url`` to ``save_path`` through a ``.part`` file renamed on completion.
+
+    A leftover ``.part`` file is resumed with an HTTP Range request sent
+    with ``If-Range`` and the ETag or Last-Modified saved next to it in
+    ``.part.validator``; a server ignoring the range, or whose file
+    changed since, restarts it from scratch. ``limiter`` (a
+    HostRateLimiter) is waited on before every request. Only transient
+    errors are retried, with exponential backoff.
+
+    Returns True when downloaded, False when the server says the file is
+    missing (404/410), and None on any other failure.
+    """
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    for i in range(3):
+    part_fp = save_path + ".part"
+    validator_fp = part_fp + ".validator"
+    session = get_session(url)
+    i = 0
+    restarted = False
+    while i < retries:
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            with open(save_path, "wb") as file:
-                file.write(response.content)
-                print(f"Downloaded {url} to {save_path}")
+            offset = os.path.getsize(part_fp) if os.path.exists(part_fp) else 0
+            validator = read_validator(validator_fp) if offset else None
+            # without a validator the .part may belong to an older file, so it is not resumed
+            headers = {"Range": f"bytes={offset}-", "If-Range": validator} if validator else {}
+            if limiter is not None:
+                limiter.wait(url)
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 416 and not restarted:
+                    # stale .part as large as the file: restart once, without using up a retry
+                    os.remove(part_fp)
+                    restarted = True
+                    continue
+                response.raise_for_status()
+                if response.status_code != 206:
+                    offset = 0
+                    write_validator(validator_fp, response)
+                with open(part_fp, "ab" if offset else "wb") as file:
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        file.write(chunk)
+            os.replace(part_fp, save_path)
+            if os.path.exists(validator_fp):
+                os.remove(validator_fp)
+            print(f"Downloaded {url} to {save_path}")
             return True
         except requests.exceptions.RequestException as e:
             print(f"Error: {e}")
+            if e.response is not None and e.response.status_code in MISSING_STATUS:
+                return False
+            if not is_transient(e) or i + 1 == retries:
+                return None
             print(f"Retrying {i+1}...")
+            time.sleep(retry_delay(e, i, backoff))
+            i += 1
+    return None
 
 
 def clean_str(_str: str):
@@ -39,11 +163,11 @@ def download_libretro_rdb(console_type, save_path):
     return download_bin_file(url, save_path)
 
 
-def download_libretro_img(url_template, name, console_type, save_path):
+def download_libretro_img(url_template, name, console_type, save_path, downloader=download_bin_file, **kwargs):
     console = INVERT_RDB_CONSOLE_MAP[console_type]
     console_name = clean_str(console)
-    url = url_template.format(console_name, clean_name(name))
-    return download_bin_file(url, save_path)
+    url = url_template.format(console_name, quote(clean_name(name)))
+    return downloader(url, save_path, **kwargs)
 
 
 download_libretro_boxart = partial(
@@ -120,15 +244,8 @@ def prepare_meta(save_path, openvgdb_version="v29.0", mame_version="0269", overw
     mame_fp = os.path.join(save_path, "mame")
     if overwrite or not os.path.exists(os.path.join(mame_fp, "mamelx.zip")):
         download_mame(mame_fp, mame_version)
+    # the progettoSnaps INI zips are read in place by MAME.parse_ini_files
     extract_zip(os.path.join(mame_fp, "mamelx.zip"), os.path.join(save_path, "mame"), "xml")
-    extract_zip(os.path.join(mame_fp, "series.zip"), os.path.join(save_path, "mame"), "ini")
-    extract_zip(os.path.join(mame_fp, "languages.zip"), os.path.join(save_path, "mame"), "ini")
-    extract_zip(os.path.join(mame_fp, "catver.zip"), os.path.join(save_path, "mame"), "ini")
-    extract_zip(os.path.join(mame_fp, "version.zip"), os.path.join(save_path, "mame"), "ini")
-
-    for r, _, f in os.walk(mame_fp):
-        for file in f:
-            shutil.move(os.path.join(r, file), os.path.join(mame_fp, file))
 
     redump_fp = os.path.join(save_path, "redump")
     if overwrite or not os.path.exists(redump_fp):
@@ -0,0 +1,271 @@
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from Rommer.core.parse_meta import DAT, MAME, RDB
+
+
+def load_metas(meta_path):
+    if meta_path.endswith(".rdb"):
+        return RDB(meta_path).parsed_data
+    elif meta_path.endswith(".dat"):
+        return DAT(meta_path).parsed_data
+    raise ValueError("Invalid metadata file.")
+
+
+def timeit(func, *args, **kwargs):
+    start = time.perf_counter()
+    res = func(*args, **kwargs)
+    return res, time.perf_counter() - start
+
+
+def bench_fuzzy(args):
+    from fuzzywuzzy import process
+
+    from Rommer.core.match import FuzzyIndex
+
+    names = list(load_metas(args.meta))
+    rng = random.Random(0)
+    suffixes = [" (Hack)", " (T-Chs)", " [b]", " (Beta)", " v1.1"]
+    queries = [rng.choice(names) + rng.choice(suffixes) for _ in range(args.num)]
+    print(f"{len(names)} meta names, {len(queries)} queries.")
+
+    index, cost = timeit(FuzzyIndex, names)
+    print(f"index built in {cost:.2f} s")
+
+    hits, cost = timeit(lambda: [index.extract(q)[0] for q in queries])
+    print(f"indexed : {len(queries) / cost:10.1f} names/s, {sum(h is not None for h in hits)} hits")
+
+    sample = queries[: args.baseline]
+    base, cost = timeit(lambda: [process.extractOne(q, names) for q in sample])
+    print(f"extractOne: {len(sample) / cost:8.1f} names/s, {sum(s > 95 for _, s in base)} / {len(sample)} hits")
+
+
+def evict_page_cache(paths):
+    """Drop the cached pages of ``paths`` so the next read hits the disk; False when unsupported."""
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for fp in paths:
+        try:
+            fd = os.open(fp, os.O_RDONLY)
+        except OSError:
+            return False
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def bench_hash(args):
+    from Rommer.core.rom import RomSet
+    from Rommer.utils.constants import ConsoleType
+
+    for i, workers in enumerate(args.workers):
+        rom_set = RomSet(ConsoleType[args.console])
+        rom_set.add_roms(args.folder, args.ext)
+        paths = sorted({r.rom_path for r in rom_set.roms.values()})
+        total = sum(os.path.getsize(fp) for fp in paths)
+        # every run reads the same files: evict them so each one starts cold
+        cold = not args.warm and evict_page_cache(paths)
+        if not cold and i == 1:
+            print("Warning: page cache not dropped, runs after the first read warm files and measure CPU, not I/O.")
+        _, cost = timeit(rom_set.scan, use_hash=True, workers=workers)
+        state = "cold" if cold else "first" if i == 0 else "warm"
+        print(f"workers={workers:<3} {cost:8.2f} s {total / cost / 1024**2:10.1f} MiB/s ({state})")
+
+
+def legacy_parse_rdb(data):
+    """The slicing RDB decoder RDB.parse_rdb replaced, kept as a baseline."""
+    from Rommer.utils.constants import RDB_TYPE_MAP
+
+    def to_int(b):
+        return int.from_bytes(b, byteorder="big")
+
+    def get_str(p):
+        indicator = to_int(data[p : p + 1])
+        if indicator == 0xD9:
+            n, p = to_int(data[p : p + 2]) - 0xD900, p + 2
+        elif indicator == 0xDA:
+            n, p = to_int(data[p : p + 3]) - 0xDA0000, p + 3
+        else:
+            n, p = indicator - 0xA0, p + 1
+        return p + n, data[p : p + n].decode("utf-8")
+
+    def get_int(p):
+        n = 2 ** (to_int(data[p : p + 1]) - 0xCC)
+        return p + 1 + n, to_int(data[p + 1 : p + 1 + n])
+
+    def get_bytes(p, key):
+        n, p = to_int(data[p : p + 2]) - 0xC400, p + 2
+        content = data[p : p + n]
+        if key == "serial":
+            try:
+                return p + n, content.decode("utf-8")
+            except UnicodeDecodeError:
+                pass
+        return p + n, content.hex().upper()
+
+    p, res = 16, []
+    while p < len(data) - 16:
+        indicator = to_int(data[p : p + 1])
+        if indicator == 0xDE:
+            n, p = to_int(data[p : p + 3]) - 0xDE0000, p + 3
+        else:
+            n, p = indicator - 0x80, p + 1
+        rom = {}
+        for _ in range(n):
+            p, key = get_str(p)
+            if RDB_TYPE_MAP[key] is str:
+                p, rom[key] = get_str(p)
+            elif RDB_TYPE_MAP[key] is int:
+                p, rom[key] = get_int(p)
+            else:
+                p, rom[key] = get_bytes(p, key)
+        res.append(rom)
+    return {r["name"]: r for r in res if "name" in r}
+
+
+def bench_rdb(args):
+    files = args.rdb
+    if len(files) == 1 and os.path.isdir(files[0]):
+        files = [os.path.join(files[0], f) for f in sorted(os.listdir(files[0])) if f.endswith(".rdb")]
+
+    total_new = total_old = 0
+    for fp in files:
+        rdb, cost_new = timeit(RDB, fp)
+        with open(fp, "rb") as f:
+            data = f.read()
+        try:
+            old, cost_old = timeit(legacy_parse_rdb, data)
+            same = "same" if old == rdb.parsed_data else "DIFF"
+        except Exception as e:  # the old decoder fails on some type codes
+            cost_old, same = 0.0, f"legacy failed: {e!r}"
+        total_new += cost_new
+        total_old += cost_old
+        print(f"{os.path.basename(fp):<60} {len(rdb.parsed_data):>7} {cost_old:7.3f} s -> {cost_new:7.3f} s  {same}")
+    print(f"total {total_old:.2f} s -> {total_new:.2f} s")
+
+
+def legacy_parse_mame(dat_fp):
+    """The start-event MAME parser MAME.parse_dat replaced, kept as a baseline."""
+    import xml.etree.ElementTree as ET
+
+    parsed_data = {}
+    context = ET.iterparse(dat_fp, events=("start",))
+    next(context)
+    tags = ["description", "year", "manufacturer"]
+    for _, elem in context:
+        if elem.tag in ["machine", "game"]:
+            meta = elem.attrib
+            parsed_data[meta["name"]] = meta
+        elif elem.tag in tags:
+            meta[elem.tag] = elem.text
+    return parsed_data
+
+
+def bench_mame(args):
+    """Run one parser per process, since ru_maxrss only ever grows."""
+    if args.legacy:
+        data, cost = timeit(legacy_parse_mame, args.xml)
+    else:
+        data, cost = timeit(lambda: MAME(args.xml).parsed_data)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    print(f"{'legacy' if args.legacy else 'MAME'}: {len(data)} machines, {cost:.2f} s, peak RSS {peak:.1f} MiB")
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_dir(root):
+    """Serve ``root`` on a local port from a background thread."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=root))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def legacy_download(url, save_path):
+    """One fresh connection per URL and the whole body in memory, as download_bin_file used to."""
+    import requests
+
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    response = requests.get(url)
+    response.raise_for_status()
+    with open(save_path, "wb") as file:
+        file.write(response.content)
+    return True
+
+
+def bench_download(args):
+    from Rommer.utils import spider
+
+    root = tempfile.mkdtemp()
+    try:
+        src = os.path.join(root, "src")
+        os.makedirs(src)
+        for i in range(args.num):
+            with open(os.path.join(src, f"{i}.bin"), "wb") as f:
+                f.write(os.urandom(args.size * 1024))
+        server, base = serve_dir(src)
+        total = args.num * args.size / 1024
+
+        for label, download in [("legacy", legacy_download), ("pooled", spider.download_bin_file)]:
+            out = os.path.join(root, label)
+            start = time.perf_counter()
+            for i in range(args.num):
+                download(f"{base}/{i}.bin", os.path.join(out, f"{i}.bin"))
+            cost = time.perf_counter() - start
+            print(f"{label:<7} {args.num / cost:8.1f} files/s {total / cost:8.1f} MiB/s")
+        server.shutdown()
+    finally:
+        shutil.rmtree(root)
+
+
+parser = argparse.ArgumentParser(description="Benchmarks for Rommer hot paths.")
+subparsers = parser.add_subparsers(dest="bench", required=True)
+
+fuzzy_parser = subparsers.add_parser("fuzzy", help="Indexed fuzzy matching vs process.extractOne.")
+fuzzy_parser.add_argument("--meta", type=str, required=True, help="RDB or DAT file.")
+fuzzy_parser.add_argument("--num", type=int, default=10000, help="Number of unmatched names.")
+fuzzy_parser.add_argument("--baseline", type=int, default=200, help="Queries timed with extractOne.")
+fuzzy_parser.set_defaults(func=bench_fuzzy)
+
+hash_parser = subparsers.add_parser("hash", help="Rom hashing throughput from 1 to N workers.")
+hash_parser.add_argument("--folder", type=str, required=True, help="Rom folder.")
+hash_parser.add_argument("--ext", type=str, nargs="+", required=True, help="Valid rom extensions.")
+hash_parser.add_argument("--console", type=str, default="OTHER", help="ConsoleType name.")
+hash_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Worker counts.")
+hash_parser.add_argument("--warm", action="store_true", help="Keep files in the page cache between runs.")
+hash_parser.set_defaults(func=bench_hash)
+
+rdb_parser = subparsers.add_parser("rdb", help="RDB decoder vs the legacy slicing decoder.")
+rdb_parser.add_argument("rdb", type=str, nargs="+", help="RDB files or a folder of RDB files.")
+rdb_parser.set_defaults(func=bench_rdb)
+
+mame_parser = subparsers.add_parser("mame", help="MAME XML parse time and peak RSS.")
+mame_parser.add_argument("xml", type=str, help="MAME -listxml output.")
+mame_parser.add_argument("--legacy", action="store_true", help="Time the old start-event parser instead.")
+mame_parser.set_defaults(func=bench_mame)
+
+download_parser = subparsers.add_parser("download", help="download_bin_file vs plain requests.get on a local server.")
+download_parser.add_argument("--num", type=int, default=200, help="Number of files.")
+download_parser.add_argument("--size", type=int, default=64, help="File size in KiB.")
+download_parser.set_defaults(func=bench_download)
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    args.func(args)
@@ -3,49 +3,150 @@ import sys
 import json
 import sqlite3
 import argparse
-
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
 from Rommer.core.parse_meta import RDB
+from Rommer.utils.constants import RDB_TYPE_MAP
+
+COLUMNS = list(RDB_TYPE_MAP)
+INDEXED = ["crc", "md5", "sha1", "serial", "name", "platform"]
+BATCH_SIZE = 5000
+
+
+def platform_name(fp):
+    return ".".join(os.path.split(fp)[1].split(".")[:-1])
+
+
+def parse_rows(fp):
+    """Pool worker: one RDB as (platform, expected, rows in COLUMNS order)."""
+    rdb = RDB(fp)
+    rows = [tuple(meta.get(c) for c in COLUMNS) for meta in rdb.parsed_data.values()]
+    return platform_name(fp), rdb.expect_num, rows
+
+
+def dump_json(fp, out, indent=None):
+    """Pool worker: one RDB dumped straight to its JSON file."""
+    rdb = RDB(fp)
+    with open(out, "w") as f:
+        json.dump(rdb.parsed_data, f, indent=indent)
+    return platform_name(fp), rdb.expect_num, len(rdb.parsed_data)
+
+
+def connect(db_fp, force=False):
+    """Open the db, recreating ``meta`` when forced or when it has another layout.
+
+    A db written by the old pandas exporter has no ``files`` table and
+    different ``meta`` columns; it is rebuilt instead of appended to.
+    """
+    conn = sqlite3.connect(db_fp)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(meta)")]
+    if force or (tables and ("files" not in tables or columns != [*COLUMNS, "platform"])):
+        if not force:
+            print(f"{db_fp} has an old layout, rebuilding it.")
+        conn.execute("DROP TABLE IF EXISTS meta")
+        conn.execute("DROP TABLE IF EXISTS files")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS meta ({', '.join(COLUMNS)}, platform TEXT)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS files (platform TEXT PRIMARY KEY, path TEXT, file_size INTEGER, mtime_ns INTEGER)"
+    )
+    conn.commit()
+    return conn
+
+
+def changed_files(conn, files):
+    known = {p: (s, m) for p, s, m in conn.execute("SELECT platform, file_size, mtime_ns FROM files")}
+    res = []
+    for fp in files:
+        st = os.stat(fp)
+        if known.get(platform_name(fp)) != (st.st_size, st.st_mtime_ns):
+            res.append(fp)
+    return res
+
+
+def load_db(files, output, workers, force=False, prune=False):
+    db_fp = os.path.join(output, "rdb.db")
+    conn = connect(db_fp, force)
+    if prune:
+        current = {platform_name(fp) for fp in files}
+        for (platform,) in conn.execute("SELECT platform FROM files").fetchall():
+            if platform not in current:
+                print("removing", platform)
+                conn.execute("DELETE FROM meta WHERE platform = ?", (platform,))
+                conn.execute("DELETE FROM files WHERE platform = ?", (platform,))
+        conn.commit()
+
+    todo = changed_files(conn, files)
+    print(f"{len(todo)} / {len(files)} RDB files changed.")
+
+    insert = f"INSERT INTO meta ({', '.join(COLUMNS)}, platform) VALUES ({', '.join('?' * (len(COLUMNS) + 1))})"
+    paths = {platform_name(fp): fp for fp in todo}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for platform, expect, rows in pool.map(parse_rows, todo):
+            fp = paths[platform]
+            st = os.stat(fp)
+            print(f"parsed {fp}: expect {expect} entries, parsed {len(rows)} entries.")
+            with conn:
+                conn.execute("DELETE FROM meta WHERE platform = ?", (platform,))
+                for i in range(0, len(rows), BATCH_SIZE):
+                    conn.executemany(insert, [(*row, platform) for row in rows[i : i + BATCH_SIZE]])
+                conn.execute(
+                    "INSERT OR REPLACE INTO files (platform, path, file_size, mtime_ns) VALUES (?, ?, ?, ?)",
+                    (platform, os.path.abspath(fp), st.st_size, st.st_mtime_ns),
+                )
+
+    # indexes are built once after the bulk load rather than maintained per insert
+    for column in INDEXED:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_meta_{column} ON meta ({column})")
+    conn.commit()
+    conn.close()
+    print("dumped to", db_fp)
+
+
+def dump_jsons(files, output, workers, force=False, indent=None):
+    todo = []
+    for fp in files:
+        out = os.path.join(output, platform_name(fp) + ".json")
+        if force or not os.path.exists(out) or os.path.getmtime(out) < os.path.getmtime(fp):
+            todo.append((fp, out))
+    print(f"{len(todo)} / {len(files)} RDB files changed.")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [(out, pool.submit(dump_json, fp, out, indent)) for fp, out in todo]
+        for out, future in futures:
+            platform, expect, parsed = future.result()
+            print(f"{platform}: expect {expect} entries, parsed {parsed} entries, dumped to {out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse RDB files to JSON or sqlite3 db.")
+    parser.add_argument("--base", type=str, help="Base directory of RDB files or a single RDB file.")
+    parser.add_argument("--type", type=str, default="json", help="Output format: json or db.")
+    parser.add_argument("--output", type=str, default="data", help="Output directory.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parser processes.")
+    parser.add_argument("--force", action="store_true", help="Re-parse every RDB, not only changed ones.")
+    parser.add_argument("--indent", type=int, default=None, help="JSON indent, compact by default.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.output):
+        os.mkdir(args.output)
+
+    if os.path.isdir(args.base):
+        files = sorted(os.path.join(args.base, fp) for fp in os.listdir(args.base) if fp.endswith(".rdb"))
+    else:
+        files = [args.base]
 
-parser = argparse.ArgumentParser(description="Parse RDB files to JSON or sqlite3 db.")
-parser.add_argument("--base", type=str, help="Base directory of RDB files or a single RDB file.")
-parser.add_argument("--type", type=str, default="json", help="Output format: json or db.")
-parser.add_argument("--output", type=str, default="data", help="Output directory.")
-args = parser.parse_args()
-
-if not os.path.exists(args.output):
-    os.mkdir(args.output)
-
-if os.path.isdir(args.base):
-    base = args.base
-    fps = os.listdir(base)
-    files = [os.path.join(args.base, fp) for fp in fps if fp.endswith(".rdb")]
-else:
-    files = [args.base]
-
-res = []
-for file in files:
-    name = ".".join(os.path.split(file)[1].split(".")[:-1])
-    rdb = RDB(file)
-    print("parsing", file)
-    print(f"expect {rdb.expect_num} entries, parsed {len(rdb.parsed_data)} entries.")
     if args.type == "json":
-        out = os.path.join(args.output, name + ".json")
-        json.dump(rdb.parsed_data, open(out, "w"), indent=4)  # noqa: SIM115
-        print("dumped to", out, "\n")
+        dump_jsons(files, args.output, args.workers, args.force, args.indent)
     elif args.type == "db":
-        df = pd.DataFrame(rdb.parsed_data)
-        df["platform"] = name
-        res.append(df)
+        load_db(files, args.output, args.workers, args.force, prune=os.path.isdir(args.base))
     else:
         raise ValueError("Invalid output format.")
 
-if args.type == "db":
-    r = pd.concat(res)
-    conn = sqlite3.connect(os.path.join(args.output, "rdb.db"))
-    r.to_sql(name="meta", con=conn, index=False, if_exists="replace")
-    conn.close()
-    print("dumped to", os.path.join(args.output, "rdb.db"))
+
+if __name__ == "__main__":
+    main()